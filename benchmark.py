@@ -0,0 +1,159 @@
+"""
+Times the main paths of DigitalInputer on random expressions
+(see lib/ExpressionGenerator.py) and prints the results as
+JSON, so that runs on different commits can be compared:
+
+	python benchmark.py --seed 0 --vars 12 > before.json
+
+Every benchmark is run --repeat times on the same --count
+expressions; the best and the median times are reported, in
+seconds for all the expressions together.
+"""
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+
+from lib.DigitalInputer import DigitalInputer
+from lib.ExpressionGenerator import ExpressionGenerator
+
+
+def get_arguments():
+	parser = argparse.ArgumentParser(description="Benchmarks DigitalInputer on random expressions")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--vars", type=int, default=12, help="number of variables to pick from")
+	parser.add_argument("--depth", type=int, default=6, help="maximum nesting of operations")
+	parser.add_argument("--fan-in", type=int, default=3, help="maximum number of operands")
+	parser.add_argument("--operators", default=None, help="symbols of the operators to use, such as '*+!'")
+	parser.add_argument("--count", type=int, default=20, help="number of expressions")
+	parser.add_argument("--rows", type=int, default=1000, help="number of get_output calls per expression")
+	parser.add_argument("--repeat", type=int, default=5)
+	parser.add_argument("--table-limit", type=int, default=16, help="skip the table benchmarks above this many variables")
+	parser.add_argument("--output", default=None, help="file to write the JSON to, instead of the standard output")
+	return parser.parse_args()
+
+
+def get_commit():
+	try:
+		return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+	except OSError:
+		return None
+
+
+def time_runs(run, repeat):
+	"""
+	Returns the times of repeat calls of run, in seconds
+	"""
+	times = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		run()
+		times.append(time.perf_counter() - start)
+	return times
+
+
+def get_benchmarks(raws, arguments):
+	"""
+	Returns the benchmarks by name, each a function running
+	it once on every expression
+	"""
+	generator = random.Random(arguments.seed)
+	inputers = [DigitalInputer(raw) for raw in raws]
+	rows = [[[generator.randint(0, 1) for _ in range(inputer.expression.varCount)] for _ in range(arguments.rows)] for inputer in inputers]
+	others = [DigitalInputer(raw) for raw in raws[1:] + raws[:1]]
+	# double NOTs, so that the raws differ and the expressions
+	# go through EquivalenceChecker instead of comparing raws
+	equivalents = [DigitalInputer("!(!(" + raw + "))") for raw in raws]
+
+	def construct():
+		# without the cache, so that parsing and compiling are timed
+		DigitalInputer.CACHE.clear()
+		for raw in raws:
+			DigitalInputer(raw)
+
+	def construct_cached():
+		for raw in raws:
+			DigitalInputer(raw)
+
+	def get_output():
+		for inputer, arrays in zip(inputers, rows):
+			for array in arrays:
+				inputer.get_output(array)
+
+	def get_output_lazy():
+		for inputer, arrays in zip(inputers, rows):
+			for array in arrays:
+				inputer.get_output(array, lazy=True)
+
+	def get_truth_table():
+		# a new DigitalInputer does not have its table yet
+		for raw in raws:
+			DigitalInputer(raw).get_truth_table()
+
+	def get_table_output_dictionary():
+		for raw in raws:
+			DigitalInputer(raw).get_table_output_dictionary()
+
+	def get_output_table_print_ready():
+		for raw in raws:
+			DigitalInputer(raw).get_output_table_print_ready()
+
+	def write_output_table():
+		for raw in raws:
+			DigitalInputer(raw).write_output_table(io.StringIO(), "csv")
+
+	def equals():
+		for inputer, equivalent, other in zip(inputers, equivalents, others):
+			inputer == equivalent
+			inputer == other
+
+	benchmarks = {
+		"construct": construct,
+		"construct_cached": construct_cached,
+		"get_output": get_output,
+		"get_output_lazy": get_output_lazy,
+		"equals": equals,
+	}
+	if arguments.vars <= arguments.table_limit:
+		benchmarks.update({
+			"get_truth_table": get_truth_table,
+			"get_table_output_dictionary": get_table_output_dictionary,
+			"get_output_table_print_ready": get_output_table_print_ready,
+			"write_output_table": write_output_table,
+		})
+	return benchmarks
+
+
+def main():
+	arguments = get_arguments()
+	generator = ExpressionGenerator(arguments.seed, arguments.vars, arguments.depth, arguments.fan_in, arguments.operators and list(arguments.operators))
+	raws = [generator.generate() for _ in range(arguments.count)]
+	results = {}
+	for name, run in get_benchmarks(raws, arguments).items():
+		times = sorted(time_runs(run, arguments.repeat))
+		results[name] = {"best": times[0], "median": times[len(times) // 2], "runs": len(times)}
+	report = {
+		"commit": get_commit(),
+		"python": platform.python_version(),
+		"parameters": vars(arguments),
+		"expressions": {
+			"count": len(raws),
+			"characters": sum([len(raw) for raw in raws]),
+			"operations": sum([len(DigitalInputer(raw).compiled.instructions) for raw in raws]),
+		},
+		"results": results,
+	}
+	if arguments.output is None:
+		json.dump(report, sys.stdout, indent=2)
+		sys.stdout.write("\n")
+	else:
+		with open(arguments.output, "w") as file:
+			json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+	main()
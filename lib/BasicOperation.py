@@ -1,3 +1,6 @@
+import itertools
+
+
 class InputAsserter:
 	"""
 	Asserts whether an array of inputs or an input is valid
@@ -43,6 +46,20 @@ class InputAsserter:
 		InputAsserter.assert_inputs(INS)
 		assert len(INS) == 2, "Inputs list must be of length 2"
 
+	@staticmethod
+	def assert_matrix_is_valid(matrix, width):
+		"""
+		Checks whether the matrix is a 2-D NumPy array of
+		booleans or integers with width columns, all of
+		which are 1 or 0. This checks a whole batch of
+		inputs at once.
+		"""
+		assert getattr(matrix, "ndim", None) == 2, "Argument given must be a 2-D array"
+		assert matrix.shape[1] == width, "The number of columns must equal " + str(width)
+		assert matrix.dtype.kind in "biu", "Array given must contain booleans or integers"
+		if matrix.dtype.kind != "b":
+			assert ((matrix == 0) | (matrix == 1)).all(), "inputs must all be 1 or 0"
+
 	@staticmethod
 	def assert_array_is_valid(array):
 		"""
@@ -118,13 +135,224 @@ class BasicOperation:
 		return operation == ord(BasicOperation.SYMBOLS["AND"])
 
 
+class Operator:
+	"""
+	A logic operator, as everything handling operation codes
+	sees it:
+	- symbol: the character standing for it in raw
+		expressions. Its code, ord(symbol), is the operation
+		code found in parsed Expressions; it must be below 256.
+	- name: its name, such as "AND"
+	- kernel(inputs): returns its output for a list of 1s
+		and 0s, raising AssertionError for invalid inputs
+	- minimum and maximum: the numbers of inputs it can take
+		(maximum being None if there is no limit)
+	- bitwise(ONE, *inputs): optional; returns its output using
+		only &, |, ^ and ONE, so that it works on masks (see
+		TruthTable.py), arrays and diagrams. Without it, one is
+		made from template or, failing that, from kernel.
+	- template(names): optional; returns Python code doing what
+		bitwise does on the given operand names, which
+		CompiledExpression.py inlines instead of calling bitwise
+	- controlling: an input value that decides the output on
+		its own, whatever the other inputs are (0 for AND), or
+		None; controlled is the output it decides
+	- commutative: whether the order of the inputs does not
+		matter
+
+	Operators are registered with AdvancedOperation.register,
+	after which raw expressions can use their symbol. mux(),
+	majority() and threshold(k) make gates that are not
+	registered by default.
+	"""
+
+	# wide operations are grouped by parentheses of at most
+	# this many operands in generated code (see join)
+	JOIN_WIDTH = 32
+
+	def __init__(self, symbol, name, kernel, minimum=2, maximum=None, bitwise=None, template=None, controlling=None, controlled=None, commutative=True):
+		assert type(symbol) == str and len(symbol) == 1, "symbol must be a single character"
+		assert ord(symbol) < 256, "symbol must have a code below 256"
+		self.symbol = symbol
+		self.code = ord(symbol)
+		self.name = name
+		self.kernel = kernel
+		self.minimum = minimum
+		self.maximum = maximum
+		self.bitwise = bitwise
+		self.template = template
+		self.controlling = controlling
+		self.controlled = controlled
+		self.commutative = commutative
+		# bitwise functions made from template, by number of inputs
+		self.__templated = {}
+
+	def is_arity_valid(self, count):
+		return count >= self.minimum and (self.maximum is None or count <= self.maximum)
+
+	def get_bitwise(self):
+		"""
+		Returns the function bitwise(ONE, *inputs) of the
+		operator, making it from template or kernel if needed
+		"""
+		if self.bitwise is not None:
+			return self.bitwise
+		if self.template is not None:
+			return self.__get_templated
+		return self.__get_minterms
+
+	def __get_templated(self, ONE, *inputs):
+		count = len(inputs)
+		if count not in self.__templated:
+			names = ["s" + str(index) for index in range(count)]
+			source = "lambda ONE, " + ", ".join(names) + ": " + self.template(names)
+			self.__templated[count] = eval(source)
+		return self.__templated[count](ONE, *inputs)
+
+	def __get_minterms(self, ONE, *inputs):
+		# OR of the inputs' minterms on which kernel gives 1;
+		# this grows exponentially with the number of inputs
+		result = 0
+		for row in itertools.product((0, 1), repeat=len(inputs)):
+			if self.kernel(list(row)) == 1:
+				term = ONE
+				for IN, bit in zip(inputs, row):
+					term = term & (IN if bit == 1 else IN ^ ONE)
+				result = result | term
+		return result
+
+	@staticmethod
+	def join(names, separator):
+		"""
+		Joins names with separator, grouping them by
+		parentheses of at most JOIN_WIDTH names so that
+		operations with many operands do not make Python
+		compile deeply nested code
+		"""
+		width = Operator.JOIN_WIDTH
+		while len(names) > width:
+			names = ["(" + separator.join(names[index:index + width]) + ")" for index in range(0, len(names), width)]
+		return separator.join(names)
+
+	@staticmethod
+	def mux(symbol="?"):
+		"""
+		Returns the multiplexer "S?A?B": A when S is 0 and B
+		when S is 1
+		"""
+		def kernel(array):
+			InputAsserter.assert_inputs(array)
+			assert len(array) == 3, "Inputs list must be of length 3"
+			return array[2] if array[0] == 1 else array[1]
+
+		def template(names):
+			return "(" + names[1] + " & (" + names[0] + " ^ ONE)) | (" + names[2] + " & " + names[0] + ")"
+
+		return Operator(symbol, "MUX", kernel, 3, 3, template=template, commutative=False)
+
+	@staticmethod
+	def threshold(k, symbol, name=None):
+		"""
+		Returns the gate giving 1 when at least k of its
+		inputs are 1
+		"""
+		assert type(k) == int and k >= 0, "k must be a non negative integer"
+
+		def kernel(array):
+			InputAsserter.assert_array_is_valid(array)
+			InputAsserter.assert_inputs(array)
+			return 1 if sum(array) >= k else 0
+
+		def bitwise(ONE, *inputs):
+			return Operator.get_at_least(k, ONE, inputs)
+
+		return Operator(symbol, name or "THRESHOLD" + str(k), kernel, bitwise=bitwise)
+
+	@staticmethod
+	def majority(symbol="#"):
+		"""
+		Returns the gate giving 1 when more than half of its
+		inputs are 1
+		"""
+		def kernel(array):
+			InputAsserter.assert_array_is_valid(array)
+			InputAsserter.assert_inputs(array)
+			return 1 if 2 * sum(array) > len(array) else 0
+
+		def bitwise(ONE, *inputs):
+			return Operator.get_at_least(len(inputs) // 2 + 1, ONE, inputs)
+
+		return Operator(symbol, "MAJORITY", kernel, bitwise=bitwise)
+
+	@staticmethod
+	def get_at_least(k, ONE, inputs):
+		"""
+		Returns whether at least k of the inputs are 1, using
+		only &, | and ONE: after each input, at_least[j] is
+		whether at least j of the inputs so far are 1. The
+		0s and 1s it starts from are made from an input, so
+		the result has its type even when k is more than the
+		number of inputs.
+		"""
+		zero = inputs[0] ^ inputs[0]
+		at_least = [zero | ONE] + [zero] * k
+		for IN in inputs:
+			for j in range(k, 0, -1):
+				at_least[j] = at_least[j] | (at_least[j - 1] & IN)
+		return at_least[k]
+
+
 class AdvancedOperation(BasicOperation):
 	"""
 	Has, in addition to basic logic operations
 	OR, AND, and NOT: NOR, NAND, XOR, IMPLIES, and IFF.
+
+	Every operator, including custom ones, is an Operator
+	kept in OPERATORS by operation code, so getting an output
+	is a single lookup. Use register() to add gates.
 	"""
 
 	SYMBOLS = {"OR": "+", "AND": "*", "NOT": "!", "XOR": "^", "NOR": "$", "NAND": "&", "IMPLIES": ">", "IFF": "|"}
+	# the registry: Operator by operation code, and operation
+	# code by symbol (see ExpressionAsserter.py)
+	OPERATORS = {}
+	SYMBOL_CODES = {}
+
+	@staticmethod
+	def register(operator):
+		"""
+		Adds an Operator, which raw expressions can then use.
+		Worker processes (see TruthTable.py) need the same
+		operators, so register them before starting any.
+		"""
+		symbol = operator.symbol
+		assert not (symbol.isalnum() or symbol in " ()[]_"), "symbol cannot be a letter, a digit, a blank space, a parenthesis, a bracket or _"
+		assert operator.code not in AdvancedOperation.OPERATORS, "An operator already uses the symbol " + symbol
+		AdvancedOperation.OPERATORS[operator.code] = operator
+		AdvancedOperation.SYMBOL_CODES[symbol] = operator.code
+		AdvancedOperation.SYMBOLS.setdefault(operator.name, symbol)
+
+	@staticmethod
+	def unregister(symbol):
+		"""
+		Removes the Operator registered with symbol.
+		Expressions already parsed with it, including the
+		ones in DigitalInputer.CACHE, must not be used anymore.
+		"""
+		operator = AdvancedOperation.OPERATORS.pop(ord(symbol))
+		del AdvancedOperation.SYMBOL_CODES[symbol]
+		if AdvancedOperation.SYMBOLS.get(operator.name) == symbol:
+			del AdvancedOperation.SYMBOLS[operator.name]
+
+	@staticmethod
+	def get_operator(operation):
+		"""
+		Returns the Operator of an operation code
+		"""
+		operator = AdvancedOperation.OPERATORS.get(operation)
+		if operator is None:
+			raise NotImplementedError('Operation is not a valid AdvancedOperation')
+		return operator
 
 	@staticmethod
 	def NOR(array):
@@ -175,52 +403,40 @@ class AdvancedOperation(BasicOperation):
 		Given an operation code (33, 42, 43), this will
 		give an output. The input is a list of 1s and 0s
 		"""
-		if AdvancedOperation.__is_NOT_operation(operation):
-			return BasicOperation.NOT(inputs)
-		if AdvancedOperation.__is_OR_operation(operation):
-			return BasicOperation.OR(inputs)
-		if AdvancedOperation.__is_AND_operation(operation):
-			return BasicOperation.AND(inputs)
-		if AdvancedOperation.__is_NOR_operation(operation):
-			return AdvancedOperation.NOR(inputs)
-		if AdvancedOperation.__is_NAND_operation(operation):
-			return AdvancedOperation.NAND(inputs)
-		if AdvancedOperation.__is_XOR_operation(operation):
-			return AdvancedOperation.XOR(inputs)
-		if AdvancedOperation.__is_IMPLIES_operation(operation):
-			return AdvancedOperation.IMPLIES(inputs)
-		if AdvancedOperation.__is_IFF_operation(operation):
-			return AdvancedOperation.IFF(inputs)
-		raise NotImplementedError('Operation is not a valid AdvancedOperation')
+		return AdvancedOperation.get_operator(operation).kernel(inputs)
 
 	@staticmethod
-	def __is_NOT_operation(operation):
-		return operation == ord(BasicOperation.SYMBOLS["NOT"])
-
-	@staticmethod
-	def __is_OR_operation(operation):
-		return operation == ord(BasicOperation.SYMBOLS["OR"])
-
-	@staticmethod
-	def __is_AND_operation(operation):
-		return operation == ord(BasicOperation.SYMBOLS["AND"])
-
-	@staticmethod
-	def __is_NOR_operation(operation):
-		return operation == ord(AdvancedOperation.SYMBOLS["NOR"])
-
-	@staticmethod
-	def __is_NAND_operation(operation):
-		return operation == ord(AdvancedOperation.SYMBOLS["NAND"])
-
-	@staticmethod
-	def __is_XOR_operation(operation):
-		return operation == ord(AdvancedOperation.SYMBOLS["XOR"])
-
-	@staticmethod
-	def __is_IMPLIES_operation(operation):
-		return operation == ord(AdvancedOperation.SYMBOLS["IMPLIES"])
+	def is_commutative(operation):
+		"""
+		Checks whether the order of the inputs of the
+		operation code given does not matter, which is
+		the case of every built-in operation but IMPLIES (and
+		NOT, which only has one input)
+		"""
+		operator = AdvancedOperation.OPERATORS.get(operation)
+		return operator is None or operator.commutative
 
 	@staticmethod
-	def __is_IFF_operation(operation):
-		return operation == ord(AdvancedOperation.SYMBOLS["IFF"])
+	def is_arity_valid(operation, count):
+		"""
+		Checks whether the operation code given can take
+		count inputs: NOT takes exactly 1, IMPLIES and IFF
+		take exactly 2 and the others take 2 or more.
+		Operation codes that are not registered take none.
+		"""
+		operator = AdvancedOperation.OPERATORS.get(operation)
+		return operator is not None and operator.is_arity_valid(count)
+
+
+for operator in (
+	Operator("!", "NOT", BasicOperation.NOT, 1, 1, template=lambda names: names[0] + " ^ ONE", commutative=False),
+	Operator("$", "NOR", AdvancedOperation.NOR, template=lambda names: "(" + Operator.join(names, " | ") + ") ^ ONE", controlling=1, controlled=0),
+	Operator("&", "NAND", AdvancedOperation.NAND, template=lambda names: "(" + Operator.join(names, " & ") + ") ^ ONE", controlling=0, controlled=1),
+	Operator("*", "AND", BasicOperation.AND, template=lambda names: Operator.join(names, " & "), controlling=0, controlled=0),
+	Operator("+", "OR", BasicOperation.OR, template=lambda names: Operator.join(names, " | "), controlling=1, controlled=1),
+	# 0,1 => 0 and everything else => 1
+	Operator(">", "IMPLIES", AdvancedOperation.IMPLIES, 2, 2, template=lambda names: names[0] + " | (" + names[1] + " ^ ONE)", commutative=False),
+	Operator("^", "XOR", AdvancedOperation.XOR, template=lambda names: Operator.join(names, " ^ ")),
+	Operator("|", "IFF", AdvancedOperation.IFF, 2, 2, template=lambda names: names[0] + " ^ " + names[1] + " ^ ONE"),
+):
+	AdvancedOperation.register(operator)
@@ -0,0 +1,421 @@
+from lib.BasicOperation import AdvancedOperation
+
+
+class BinaryDecisionDiagram:
+	"""
+	Manages reduced ordered binary decision diagrams (ROBDDs):
+	graphs where every node tests one variable and goes to
+	its low child if that variable is 0 and to its high child
+	if it is 1, down to one of the two terminals 0 and 1.
+
+	Variables are tested in a fixed order (from level 0 down)
+	and nodes are unique: no two nodes test the same variable
+	with the same children, and no node has two equal children.
+	This makes the diagram of a function canonical, so two
+	functions built in the same manager are equal if and only
+	if they are the same node.
+
+	Nodes are integers: 0 and 1 are the terminals, and every
+	other node has its variable, low child and high child
+	stored at its index in nodeVars, lows and highs. Variables
+	are integers too: their index in self.variables.
+
+	Every operation goes through ite(f, g, h), "if f then g
+	else h", whose results are cached.
+	"""
+
+	CODES = {name: ord(symbol) for name, symbol in AdvancedOperation.SYMBOLS.items()}
+	# operations folded over their operands with ite; other
+	# custom operators go through their bitwise function
+	FOLDED_CODES = (CODES["AND"], CODES["NAND"], CODES["OR"], CODES["NOR"], CODES["XOR"])
+
+	def __init__(self, variables, order=None):
+		"""
+		variables is a list of names. order, if given, is
+		the same names in the order they are tested in;
+		otherwise they are tested in the order of variables.
+		"""
+		self.variables = []
+		self.varIndex = {}
+		self.order = []
+		self.levels = []
+		self.nodeVars, self.lows, self.highs = [-1, -1], [0, 1], [0, 1]
+		self.unique = {}
+		self.cache = {}
+		self.varNodes = []
+		for name in variables:
+			self.add_variable(name)
+		if order is not None:
+			self.set_order(order)
+
+	def add_variable(self, name):
+		"""
+		Adds a variable, tested after all the others, and
+		returns its index
+		"""
+		if name not in self.varIndex:
+			self.varIndex[name] = len(self.variables)
+			self.levels.append(len(self.variables))
+			self.order.append(len(self.variables))
+			self.variables.append(name)
+			self.varNodes.append(set())
+		return self.varIndex[name]
+
+	def set_order(self, order):
+		"""
+		Sets the order the variables are tested in. This can
+		only be done before any node is built.
+		"""
+		assert len(self.unique) == 0, "The order can only be set before building nodes"
+		assert sorted(order) == sorted(self.variables), "The order must contain every variable once"
+		self.order = [self.varIndex[name] for name in order]
+		for level, variable in enumerate(self.order):
+			self.levels[variable] = level
+
+	def get_order(self):
+		"""
+		Returns the names of the variables in the order
+		they are tested in
+		"""
+		return [self.variables[variable] for variable in self.order]
+
+	def get_level(self, node):
+		if node < 2:
+			return len(self.variables)
+		return self.levels[self.nodeVars[node]]
+
+	def get_variable_node(self, name):
+		"""
+		Returns the node of the function equal to the
+		variable with the given name
+		"""
+		return self.make_node(self.add_variable(name), 0, 1)
+
+	def make_node(self, variable, low, high):
+		"""
+		Returns the unique node testing variable with the
+		given children
+		"""
+		if low == high:
+			return low
+		key = (variable, low, high)
+		node = self.unique.get(key)
+		if node is None:
+			node = len(self.nodeVars)
+			self.nodeVars.append(variable)
+			self.lows.append(low)
+			self.highs.append(high)
+			self.unique[key] = node
+			self.varNodes[variable].add(node)
+		return node
+
+	def ite(self, f, g, h):
+		"""
+		Returns the node of "if f then g else h"
+		"""
+		if f == 1:
+			return g
+		if f == 0:
+			return h
+		if g == h:
+			return g
+		if g == 1 and h == 0:
+			return f
+		key = (f, g, h)
+		result = self.cache.get(key)
+		if result is None:
+			level = min(self.get_level(f), self.get_level(g), self.get_level(h))
+			f0, f1 = self.__get_cofactors(f, level)
+			g0, g1 = self.__get_cofactors(g, level)
+			h0, h1 = self.__get_cofactors(h, level)
+			low = self.ite(f0, g0, h0)
+			high = self.ite(f1, g1, h1)
+			result = self.make_node(self.order[level], low, high)
+			self.cache[key] = result
+		return result
+
+	def __get_cofactors(self, node, level):
+		if self.get_level(node) == level:
+			return self.lows[node], self.highs[node]
+		return node, node
+
+	def NOT(self, f):
+		return self.ite(f, 0, 1)
+
+	def apply(self, operation, nodes):
+		"""
+		Returns the node of the operation code (as in
+		AdvancedOperation.SYMBOLS) applied to nodes
+		"""
+		codes = BinaryDecisionDiagram.CODES
+		if operation == codes["NOT"]:
+			return self.NOT(nodes[0])
+		if operation == codes["IMPLIES"]:
+			# 0,1 => 0 and everything else => 1
+			return self.ite(nodes[1], nodes[0], 1)
+		if operation == codes["IFF"]:
+			return self.ite(nodes[0], nodes[1], self.NOT(nodes[1]))
+		if operation not in BinaryDecisionDiagram.FOLDED_CODES:
+			return self.__apply_bitwise(operation, nodes)
+		result = nodes[0]
+		for node in nodes[1:]:
+			if operation in (codes["AND"], codes["NAND"]):
+				result = self.ite(result, node, 0)
+			elif operation in (codes["OR"], codes["NOR"]):
+				result = self.ite(result, 1, node)
+			else:
+				result = self.ite(result, self.NOT(node), node)
+		if operation in (codes["NAND"], codes["NOR"]):
+			return self.NOT(result)
+		return result
+
+	def __apply_bitwise(self, operation, nodes):
+		"""
+		Applies a custom operator (see Operator in
+		BasicOperation.py) by handing BddOperands to its
+		bitwise function
+		"""
+		bitwise = AdvancedOperation.get_operator(operation).get_bitwise()
+		result = bitwise(BddOperand(self, 1), *[BddOperand(self, node) for node in nodes])
+		return BddOperand.get_node(result)
+
+	def build(self, compiled):
+		"""
+		Returns the node of a compiled expression (see
+		CompiledExpression.py). Its variables are matched
+		by name, and added to the manager if needed.
+		"""
+		compiled.assert_operations_are_valid()
+		nodes = [self.get_variable_node(name) for name in compiled.varsSorted]
+		for operation, operands in compiled.instructions:
+			nodes.append(self.apply(operation, [nodes[slot] for slot in operands]))
+		return nodes[-1]
+
+	@staticmethod
+	def get_structural_order(compiled):
+		"""
+		Returns the variables of a compiled expression in the
+		order their first instruction uses them. Variables
+		computed together end up close, which keeps the
+		diagrams of circuits like adders small where the
+		alphabetical order (all the a's, then all the b's)
+		makes them grow exponentially.
+		"""
+		order, seen = [], set()
+		for _, operands in compiled.instructions:
+			for slot in operands:
+				if slot < compiled.varCount and slot not in seen:
+					seen.add(slot)
+					order.append(compiled.varsSorted[slot])
+		return order + [name for index, name in enumerate(compiled.varsSorted) if index not in seen]
+
+	def get_output(self, node, array):
+		"""
+		Returns the output of the function at node for the
+		given inputs, indexed like self.variables. This takes
+		at most one step per variable.
+		"""
+		while node > 1:
+			node = self.highs[node] if array[self.nodeVars[node]] else self.lows[node]
+		return node
+
+	def count(self, node):
+		"""
+		Returns the number of inputs (over all the variables
+		of the manager) for which the function at node is 1
+		"""
+		counts, count = {0: 0, 1: 1}, len(self.variables)
+		# deeper nodes first, so children are counted before parents
+		for current in sorted(self.__get_reachable([node]), key=self.get_level, reverse=True):
+			level = self.get_level(current)
+			low, high = self.lows[current], self.highs[current]
+			counts[current] = counts[low] * 2 ** (self.get_level(low) - level - 1)
+			counts[current] += counts[high] * 2 ** (self.get_level(high) - level - 1)
+		return counts[node] * 2 ** min(self.get_level(node), count)
+
+	def get_probability(self, node, biases):
+		"""
+		Returns the probability that the function at node is 1
+		when every variable is 1 with the probability at its
+		index in biases, independently of the others
+		"""
+		probabilities = {0: 0.0, 1: 1.0}
+		# a variable a path skips does not change its probability
+		for current in sorted(self.__get_reachable([node]), key=self.get_level, reverse=True):
+			bias = biases[self.nodeVars[current]]
+			probabilities[current] = (1 - bias) * probabilities[self.lows[current]] + bias * probabilities[self.highs[current]]
+		return probabilities[node]
+
+	def get_size(self, nodes):
+		"""
+		Returns the number of nodes (terminals excluded)
+		needed by the functions at the given nodes
+		"""
+		return len(self.__get_reachable(nodes))
+
+	def __get_reachable(self, nodes):
+		reachable, stack = set(), [node for node in nodes if node > 1]
+		while stack:
+			node = stack.pop()
+			if node in reachable:
+				continue
+			reachable.add(node)
+			for child in (self.lows[node], self.highs[node]):
+				if child > 1 and child not in reachable:
+					stack.append(child)
+		return reachable
+
+	def collect_garbage(self, nodes):
+		"""
+		Forgets every node not needed by the functions at
+		the given nodes and returns the number of nodes left.
+		Nodes that are forgotten must not be used anymore.
+		"""
+		reachable = self.__get_reachable(nodes)
+		for key, node in list(self.unique.items()):
+			if node not in reachable:
+				del self.unique[key]
+				self.varNodes[key[0]].discard(node)
+		self.cache.clear()
+		return len(reachable)
+
+	def reorder(self, nodes):
+		"""
+		Changes the order of the variables to make the
+		functions at the given nodes smaller, with sifting:
+		each variable in turn, starting from the one with the
+		most nodes, is moved to every level and left at the
+		one where the functions are the smallest.
+
+		The given nodes stay valid, but any other node is
+		forgotten (see collect_garbage).
+		"""
+		self.collect_garbage(nodes)
+		variables = sorted(range(len(self.variables)), key=lambda variable: -len(self.varNodes[variable]))
+		for variable in variables:
+			self.__sift(variable, nodes)
+
+	def __sift(self, variable, nodes):
+		last = len(self.variables) - 1
+		best_size, best_level = self.get_size(nodes), self.levels[variable]
+		# down to the last level, then up to the first one
+		while self.levels[variable] < last:
+			size = self.__swap(self.levels[variable], nodes)
+			if size < best_size:
+				best_size, best_level = size, self.levels[variable]
+		while self.levels[variable] > 0:
+			size = self.__swap(self.levels[variable] - 1, nodes)
+			if size < best_size:
+				best_size, best_level = size, self.levels[variable]
+		while self.levels[variable] < best_level:
+			self.__swap(self.levels[variable], nodes)
+
+	def __swap(self, level, nodes):
+		"""
+		Swaps the variables at level and level + 1, keeping
+		every node equal to the same function: nodes testing
+		the upper variable x that have children testing the
+		lower variable y are rewritten in place to test y
+		first, with new x nodes below them.
+
+		Nodes left unused are then forgotten, so that the
+		next swaps do not rewrite them, and the number of
+		nodes needed by the given nodes is returned.
+		"""
+		x, y = self.order[level], self.order[level + 1]
+		for node in list(self.varNodes[x]):
+			low, high = self.lows[node], self.highs[node]
+			if self.nodeVars[low] != y and self.nodeVars[high] != y:
+				continue
+			low0, low1 = (self.lows[low], self.highs[low]) if self.nodeVars[low] == y else (low, low)
+			high0, high1 = (self.lows[high], self.highs[high]) if self.nodeVars[high] == y else (high, high)
+			new_low = self.make_node(x, low0, high0)
+			new_high = self.make_node(x, low1, high1)
+			del self.unique[(x, low, high)]
+			self.varNodes[x].discard(node)
+			self.nodeVars[node], self.lows[node], self.highs[node] = y, new_low, new_high
+			self.unique[(y, new_low, new_high)] = node
+			self.varNodes[y].add(node)
+		self.order[level], self.order[level + 1] = y, x
+		self.levels[x], self.levels[y] = level + 1, level
+		return self.collect_garbage(nodes)
+
+
+class BddOperand:
+	"""
+	A node of a BinaryDecisionDiagram that supports &, | and
+	^ with other BddOperands and with the integers 0 and 1
+	(the terminals), so that the bitwise function of an
+	Operator can build diagrams.
+	"""
+
+	def __init__(self, manager, node):
+		self.manager = manager
+		self.node = node
+
+	@staticmethod
+	def get_node(operand):
+		if isinstance(operand, BddOperand):
+			return operand.node
+		assert operand == 0 or operand == 1, "Operands must be nodes, 0 or 1"
+		return int(operand)
+
+	def __and__(self, other):
+		return BddOperand(self.manager, self.manager.ite(self.node, BddOperand.get_node(other), 0))
+
+	def __or__(self, other):
+		return BddOperand(self.manager, self.manager.ite(self.node, 1, BddOperand.get_node(other)))
+
+	def __xor__(self, other):
+		other = BddOperand.get_node(other)
+		return BddOperand(self.manager, self.manager.ite(self.node, self.manager.NOT(other), other))
+
+	__rand__ = __and__
+	__ror__ = __or__
+	__rxor__ = __xor__
+
+
+class BddFunction:
+	"""
+	A function held by a BinaryDecisionDiagram: its manager
+	and its node.
+	"""
+
+	def __init__(self, manager, node):
+		self.manager = manager
+		self.node = node
+
+	def get_output(self, array):
+		"""
+		Returns the output for the given inputs, indexed
+		like the variables of the manager
+		"""
+		return self.manager.get_output(self.node, array)
+
+	def count(self):
+		"""
+		Returns the number of inputs for which the output is 1
+		"""
+		return self.manager.count(self.node)
+
+	def get_probability(self, biases):
+		"""
+		Returns the probability that the output is 1 when every
+		input is 1 with its probability in biases, indexed
+		like the variables of the manager
+		"""
+		return self.manager.get_probability(self.node, biases)
+
+	def get_size(self):
+		return self.manager.get_size([self.node])
+
+	def __eq__(self, other):
+		if isinstance(other, self.__class__):
+			return self.manager is other.manager and self.node == other.node
+		return False
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def __hash__(self):
+		return hash((id(self.manager), self.node))
@@ -0,0 +1,120 @@
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from lib.BasicOperation import AdvancedOperation, InputAsserter
+from lib.Expression import Expression
+from lib.CompiledExpression import CompiledExpression
+from lib.TruthTable import TruthTable
+
+
+class Circuit:
+	"""
+	Evaluates several named expressions over the same
+	variables in one pass, like the outputs of a circuit:
+	the sum and carry bits of an adder, the lines of a
+	decoder, and so on.
+
+	The expressions are compiled together into a single
+	function (see CompiledExpression.py) returning a tuple
+	with every output. Identical parts are computed once,
+	even when they come from different outputs, so a carry
+	used by several sums is only computed once per input.
+
+	The variables of the circuit are those of all of its
+	outputs, in natural order, and every output is given
+	inputs for all of them, including the ones it does not
+	use.
+
+	Useful methods:
+	- get_output(input_array): returns a tuple with every
+		output, in the order of outputNames
+	- get_output_dictionary(input_array): returns a
+		dictionary mapping the name of every output to it
+	- get_outputs(inputs): given a 2-D NumPy array with one
+		input per row, returns one column per output
+	- get_truth_tables(): returns a dictionary mapping the
+		name of every output to its TruthTable
+	"""
+
+	def __init__(self, outputs):
+		"""
+		outputs is a dictionary mapping the name of every
+		output to its raw expression (as defined in
+		Expression.py). Outputs keep the order of outputs.
+		"""
+		assert type(outputs) == dict, "outputs must be a dictionary mapping names to raw expressions"
+		assert len(outputs) > 0, "A circuit needs at least one output"
+		self.outputNames = list(outputs.keys())
+		self.raws = dict(outputs)
+		expressions = [Expression(outputs[name]) for name in self.outputNames]
+		self.varsSorted = Expression.sort_variables(set([var for expression in expressions for var in expression.varsSorted]))
+		self.varCount = len(self.varsSorted)
+		parsed_list = [expression.parsed for expression in expressions]
+		self.instructions, self.roots = CompiledExpression.get_shared_instructions(parsed_list, self.varsSorted)
+		self.source = CompiledExpression.get_source(self.instructions, self.varCount, self.roots)
+		self.evaluate = CompiledExpression.get_function(self.source, "evaluate")
+		self.__invalid = [(operation, len(operands)) for operation, operands in self.instructions if not AdvancedOperation.is_arity_valid(operation, len(operands))]
+
+	def assert_operations_are_valid(self):
+		"""
+		Same as CompiledExpression.assert_operations_are_valid
+		"""
+		for operation, count in self.__invalid:
+			AdvancedOperation.get_output(operation, [0] * count)
+
+	def get_output(self, array):
+		"""
+		Given an input as an array, in the order of varsSorted,
+		or as a dictionary by name, returns a tuple with every
+		output, in the order of outputNames
+		"""
+		if isinstance(array, dict):
+			array = [array[name] for name in self.varsSorted]
+		msg = "The length of the array must equal the number of variables in the circuit"
+		assert len(array) == self.varCount, msg
+		for IN in array:
+			InputAsserter.assert_input(IN)
+		return self.evaluate(array)
+
+	def get_output_dictionary(self, array):
+		"""
+		Same as get_output, as a dictionary mapping the name
+		of every output to its value
+		"""
+		return dict(zip(self.outputNames, self.get_output(array)))
+
+	def get_outputs(self, inputs):
+		"""
+		Given a 2-D NumPy array of 0s and 1s with one input per
+		row, returns a 2-D uint8 array with one row per input
+		and one column per output. This needs NumPy.
+		"""
+		if numpy is None:
+			raise ImportError("get_outputs requires numpy to be installed")
+		InputAsserter.assert_matrix_is_valid(inputs, self.varCount)
+		self.assert_operations_are_valid()
+		columns = numpy.ascontiguousarray(inputs.T, dtype=numpy.uint8)
+		return numpy.stack(self.evaluate(columns, numpy.uint8(1)), axis=1)
+
+	def get_truth_tables(self):
+		"""
+		Returns a dictionary mapping the name of every output
+		to its TruthTable (see TruthTable.py) over varsSorted.
+		Every block of rows is computed once for all outputs.
+		"""
+		self.assert_operations_are_valid()
+		size = (2 ** min(self.varCount, TruthTable.BLOCK_BITS) + 7) // 8
+		data = [bytearray() for _ in self.outputNames]
+		for block in range(TruthTable.get_block_count(self.varCount)):
+			masks, full = TruthTable.get_block_masks(self.varCount, block)
+			for index, bits in enumerate(self.evaluate(masks, full)):
+				data[index].extend(bits.to_bytes(size, "little"))
+		return {name: TruthTable(self.varsSorted, data[index]) for index, name in enumerate(self.outputNames)}
+
+	def __str__(self):
+		return "Circuit(" + ", ".join([name + "=" + self.raws[name] for name in self.outputNames]) + ")"
+
+	def __repr__(self):
+		return str(self)
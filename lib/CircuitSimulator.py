@@ -0,0 +1,142 @@
+import heapq
+
+from lib.CompiledExpression import CompiledExpression
+
+
+class CircuitSimulator:
+	"""
+	Simulates an expression as a circuit whose inputs change
+	one at a time: the current value of every input and every
+	operation is kept, along with the operations using each
+	of them (their parents), so that changing an input only
+	computes again the operations it reaches, and stops
+	wherever a value does not change.
+
+	Operations are the instructions of a CompiledExpression
+	(see CompiledExpression.py), numbered in post-order, so
+	an operation always comes after its operands. Changes
+	are propagated in that order through a heap of the
+	operations to compute again, so each is computed at most
+	once per change, after all of its changed operands.
+
+	evaluations counts the operations computed so far, which
+	shows how much of the circuit the changes reached.
+	"""
+
+	def __init__(self, expression, inputs=None):
+		"""
+		expression is an Expression (see Expression.py) or a
+		CompiledExpression. inputs are the starting inputs,
+		as a list in the order of varsSorted or a dictionary
+		by name; they are all 0 by default.
+		"""
+		compiled = expression if isinstance(expression, CompiledExpression) else CompiledExpression(expression)
+		self.compiled = compiled
+		self.varsSorted = compiled.varsSorted
+		self.varCount = compiled.varCount
+		self.varIndex = {name: index for index, name in enumerate(self.varsSorted)}
+		instructions = compiled.instructions
+		self.parents = [[] for _ in range(self.varCount + len(instructions))]
+		for index, (_, operands) in enumerate(instructions):
+			for slot in set(operands):
+				self.parents[slot].append(index)
+		self.__functions = CircuitSimulator.__get_functions(instructions)
+		self.values = [0] * (self.varCount + len(instructions))
+		self.evaluations = 0
+		if isinstance(inputs, dict):
+			inputs = [inputs[name] for name in self.varsSorted]
+		if inputs is not None:
+			assert len(inputs) == self.varCount, "The length of the array must equal the number of variables in the expression"
+			for index, value in enumerate(inputs):
+				self.values[index] = CircuitSimulator.__get_valid_value(value)
+		for index, function in enumerate(self.__functions):
+			self.values[self.varCount + index] = function(self.values)
+		self.evaluations += len(self.__functions)
+
+	@staticmethod
+	def __get_functions(instructions):
+		"""
+		Returns one function per instruction, computing it
+		from the list of values of every slot
+		"""
+		lines = []
+		for index, (operation, operands) in enumerate(instructions):
+			names = ["S[" + str(slot) + "]" for slot in operands]
+			lines.append("def f" + str(index) + "(S, ONE=1):")
+			lines.append("\treturn " + CompiledExpression.get_operation_code(operation, names))
+		lines.append("FUNCTIONS = [" + ", ".join(["f" + str(index) for index in range(len(instructions))]) + "]")
+		return CompiledExpression.get_function("\n".join(lines) + "\n", "FUNCTIONS")
+
+	@staticmethod
+	def __get_valid_value(value):
+		assert value == 0 or value == 1, "input must be 1 or 0. Received: " + str(value)
+		return int(value)
+
+	def get_output(self):
+		"""
+		Returns the current output
+		"""
+		return self.values[-1]
+
+	def get_input(self, name):
+		"""
+		Returns the current value of the input with the
+		given name
+		"""
+		return self.values[self.__get_index(name)]
+
+	def get_inputs(self):
+		"""
+		Returns the current inputs, in the order of varsSorted
+		"""
+		return self.values[:self.varCount]
+
+	def __get_index(self, name):
+		assert name in self.varIndex, "Unknown variable: " + str(name)
+		return self.varIndex[name]
+
+	def set_input(self, name, value):
+		"""
+		Sets the input with the given name and returns the
+		new output
+		"""
+		return self.set_inputs({name: value})
+
+	def flip_input(self, name):
+		"""
+		Changes the input with the given name from 0 to 1 or
+		from 1 to 0, and returns the new output
+		"""
+		return self.set_input(name, 1 - self.get_input(name))
+
+	def set_inputs(self, inputs):
+		"""
+		Sets several inputs at once, given as a dictionary
+		by name, and returns the new output. The operations
+		reached by several of them are computed once.
+		"""
+		pending, queued = [], set()
+		for name, value in inputs.items():
+			index = self.__get_index(name)
+			value = CircuitSimulator.__get_valid_value(value)
+			if self.values[index] != value:
+				self.values[index] = value
+				self.__queue_parents(index, pending, queued)
+		self.__propagate(pending, queued)
+		return self.get_output()
+
+	def __queue_parents(self, slot, pending, queued):
+		for parent in self.parents[slot]:
+			if parent not in queued:
+				queued.add(parent)
+				heapq.heappush(pending, parent)
+
+	def __propagate(self, pending, queued):
+		values, functions, count = self.values, self.__functions, self.varCount
+		while pending:
+			index = heapq.heappop(pending)
+			value = functions[index](values)
+			self.evaluations += 1
+			if values[count + index] != value:
+				values[count + index] = value
+				self.__queue_parents(count + index, pending, queued)
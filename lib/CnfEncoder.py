@@ -0,0 +1,153 @@
+from lib.BasicOperation import AdvancedOperation
+
+
+class CnfEncoder:
+	"""
+	Turns compiled expressions (see CompiledExpression.py) into
+	a formula in conjunctive normal form (CNF) with the Tseitin
+	transformation: every operation gets a new SAT variable
+	constrained to equal its output, so the formula grows
+	linearly with the expression.
+
+	SAT variables are positive integers and literals are non
+	zero integers: v means "v is 1" and -v means "v is 0", as
+	in the DIMACS format. Clauses are lists of literals.
+
+	Values (the letters) are given one SAT variable per name,
+	so that encoding several expressions in the same encoder
+	shares their common Values. This is how two expressions
+	over different but overlapping variables get compared.
+	"""
+
+	CODES = {name: ord(symbol) for name, symbol in AdvancedOperation.SYMBOLS.items()}
+
+	def __init__(self):
+		self.clauses = []
+		self.varCount = 0
+		self.variables = {}
+		self.__true = None
+
+	def new_variable(self):
+		"""
+		Returns a new SAT variable
+		"""
+		self.varCount += 1
+		return self.varCount
+
+	def get_variable(self, name):
+		"""
+		Returns the SAT variable of the Value with the given
+		name, creating it the first time
+		"""
+		if name not in self.variables:
+			self.variables[name] = self.new_variable()
+		return self.variables[name]
+
+	def encode(self, compiled):
+		"""
+		Adds the clauses of the compiled expression and returns
+		the literal equal to its output
+		"""
+		literals = [self.get_variable(name) for name in compiled.varsSorted]
+		for operation, operands in compiled.instructions:
+			inputs = [literals[slot] for slot in operands]
+			literals.append(self.__encode_operation(operation, inputs))
+		return literals[-1]
+
+	def __encode_operation(self, operation, inputs):
+		codes = CnfEncoder.CODES
+		if not AdvancedOperation.is_arity_valid(operation, len(inputs)):
+			# raises the same error as evaluating it would
+			AdvancedOperation.get_output(operation, [0] * len(inputs))
+		if operation == codes["NOT"]:
+			return -inputs[0]
+		if operation == codes["AND"]:
+			return self.encode_AND(inputs)
+		if operation == codes["OR"]:
+			return -self.encode_AND([-literal for literal in inputs])
+		if operation == codes["NAND"]:
+			return -self.encode_AND(inputs)
+		if operation == codes["NOR"]:
+			return self.encode_AND([-literal for literal in inputs])
+		if operation == codes["XOR"]:
+			return self.encode_XOR(inputs)
+		if operation == codes["IMPLIES"]:
+			# 0,1 => 0 and everything else => 1
+			return -self.encode_AND([-inputs[0], inputs[1]])
+		if operation == codes["IFF"]:
+			return -self.encode_XOR(inputs)
+		return self.__encode_bitwise(operation, inputs)
+
+	def __encode_bitwise(self, operation, inputs):
+		"""
+		Encodes a custom operator (see Operator in
+		BasicOperation.py) by handing CnfOperands to its
+		bitwise function
+		"""
+		bitwise = AdvancedOperation.get_operator(operation).get_bitwise()
+		result = bitwise(CnfOperand(self, self.get_true_literal()), *[CnfOperand(self, literal) for literal in inputs])
+		return CnfOperand.get_literal(self, result)
+
+	def get_true_literal(self):
+		"""
+		Returns a literal that is always true
+		"""
+		if self.__true is None:
+			self.__true = self.new_variable()
+			self.clauses.append([self.__true])
+		return self.__true
+
+	def encode_AND(self, inputs):
+		output = self.new_variable()
+		for literal in inputs:
+			self.clauses.append([-output, literal])
+		self.clauses.append([output] + [-literal for literal in inputs])
+		return output
+
+	def encode_XOR(self, inputs):
+		output = inputs[0]
+		for literal in inputs[1:]:
+			# chain 2-input XORs: previous ^ literal
+			previous, output = output, self.new_variable()
+			self.clauses.append([-output, previous, literal])
+			self.clauses.append([-output, -previous, -literal])
+			self.clauses.append([output, -previous, literal])
+			self.clauses.append([output, previous, -literal])
+		return output
+
+
+class CnfOperand:
+	"""
+	A literal of a CnfEncoder that supports &, | and ^ with
+	other CnfOperands and with the integers 0 and 1, adding
+	the clauses of every gate, so that the bitwise function
+	of an Operator can be encoded.
+	"""
+
+	def __init__(self, encoder, literal):
+		self.encoder = encoder
+		self.literal = literal
+
+	@staticmethod
+	def get_literal(encoder, operand):
+		if isinstance(operand, CnfOperand):
+			return operand.literal
+		assert operand == 0 or operand == 1, "Operands must be literals, 0 or 1"
+		true = encoder.get_true_literal()
+		return true if operand == 1 else -true
+
+	def __and__(self, other):
+		other = CnfOperand.get_literal(self.encoder, other)
+		return CnfOperand(self.encoder, self.encoder.encode_AND([self.literal, other]))
+
+	def __or__(self, other):
+		other = CnfOperand.get_literal(self.encoder, other)
+		return CnfOperand(self.encoder, -self.encoder.encode_AND([-self.literal, -other]))
+
+	def __xor__(self, other):
+		other = CnfOperand.get_literal(self.encoder, other)
+		return CnfOperand(self.encoder, self.encoder.encode_XOR([self.literal, other]))
+
+	__rand__ = __and__
+	__ror__ = __or__
+	__rxor__ = __xor__
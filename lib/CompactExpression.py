@@ -0,0 +1,173 @@
+from array import array
+
+from lib.Expression import Expression
+from lib.BasicOperation import AdvancedOperation
+
+
+class CompactExpression(Expression):
+	"""
+	An Expression (as defined in Expression.py) stored in
+	flat arrays instead of nested lists, for expressions with
+	millions of operations: a parsed Expression such as
+	[42, 'A', 'B'] costs a list and its references, while here
+	it costs a few bytes.
+
+	Operations are numbered in post-order, so children come
+	before their parents and the last one is the whole
+	Expression. For the operation at index i:
+	- opcodes[i] is its operation code (an array('B')),
+	- children[offsets[i]:offsets[i + 1]] are its operands
+		(offsets and children are array('i')). An operand
+		that is 0 or more is the index of another operation;
+		a negative one, -1 - index, is the Value at index in
+		varsSorted.
+
+	The parser builds these arrays directly (see make_value
+	and make_parsed), so the parsed lists are never built and
+	self.parsed is None. Identical operations are stored once,
+	like in Expression. to_parsed() returns the parsed
+	Expression as lists, and from_parsed() makes a
+	CompactExpression out of one.
+
+	For example, "(A*B)+C" is stored as opcodes [42, 43],
+	offsets [0, 2, 4] and children [-1, -2, 0, -3].
+	"""
+
+	def __init__(self, raw=None):
+		"""
+		Parses raw into arrays. Without raw, the arrays are
+		left empty (see from_parsed).
+		"""
+		self.opcodes = array("B")
+		self.offsets = array("i", [0])
+		self.children = array("i")
+		# operations already stored, by structure, and the index
+		# of every Value in the order they are found in raw
+		self.__nodes = {}
+		self.__found = {}
+		if raw is not None:
+			Expression.__init__(self, raw)
+			self.__sort_values()
+			self.parsed = None
+		else:
+			self.raw, self.vars, self.parsed = None, {}, None
+			self.varsSorted, self.varCount = [], 0
+		self.__nodes, self.__found = None, None
+
+	def make_value(self, char):
+		if char not in self.__found:
+			self.__found[char] = len(self.__found)
+		return -1 - self.__found[char]
+
+	def make_parsed(self, operation, expression_stack):
+		key = tuple(sorted(expression_stack)) if AdvancedOperation.is_commutative(operation) else tuple(expression_stack)
+		index = self.__nodes.get((operation, key))
+		if index is None:
+			index = self.__append(operation, expression_stack)
+			self.__nodes[(operation, key)] = index
+		return index
+
+	def __append(self, operation, operands):
+		self.opcodes.append(operation)
+		self.children.extend(operands)
+		self.offsets.append(len(self.children))
+		return len(self.opcodes) - 1
+
+	def __sort_values(self):
+		# Values were numbered in the order they were found;
+		# number them in the order of varsSorted instead
+		indices = [0] * len(self.__found)
+		for char, found in self.__found.items():
+			indices[found] = self.varIndex[char]
+		children = self.children
+		for position in range(len(children)):
+			if children[position] < 0:
+				children[position] = -1 - indices[-1 - children[position]]
+
+	@staticmethod
+	def from_parsed(parsed, varsSorted):
+		"""
+		Returns the CompactExpression of a parsed Expression
+		whose Values are in varsSorted
+		"""
+		compact = CompactExpression()
+		compact.varsSorted = list(varsSorted)
+		compact.varCount = len(varsSorted)
+		var_indices = {var: index for index, var in enumerate(varsSorted)}
+		indices = {}
+		for node in Expression.get_postorder_nodes(parsed):
+			operands = [indices[id(expr)] if type(expr) == list else -1 - var_indices[expr] for expr in node[1:]]
+			indices[id(node)] = compact.__append(node[0], operands)
+		return compact
+
+	def get_operands(self, index):
+		"""
+		Returns the operands of the operation at index
+		"""
+		return self.children[self.offsets[index]:self.offsets[index + 1]]
+
+	def to_parsed(self):
+		"""
+		Returns the parsed Expression, as nested lists.
+		Shared operations are shared lists.
+		"""
+		nodes = []
+		for index in range(len(self.opcodes)):
+			node = [self.opcodes[index]]
+			node.extend([nodes[ref] if ref >= 0 else self.varsSorted[-1 - ref] for ref in self.get_operands(index)])
+			nodes.append(node)
+		return nodes[-1]
+
+	def get_instructions(self):
+		"""
+		Returns the instructions as CompiledExpression.py
+		defines them, as a CompactInstructions reading them
+		from the arrays instead of a list holding them all:
+		the slot of a Value is its index and the slot of an
+		operation is varCount + its index
+		"""
+		return CompactInstructions(self.opcodes, self.offsets, self.children, self.varCount)
+
+	def get_output(self, array):
+		"""
+		Returns the output for the given input array, in the
+		order of varsSorted, by going through the arrays once
+		"""
+		assert len(array) == self.varCount, "The length of the array must equal the number of variables in the expression"
+		values = []
+		for index in range(len(self.opcodes)):
+			inputs = [values[ref] if ref >= 0 else array[-1 - ref] for ref in self.get_operands(index)]
+			values.append(AdvancedOperation.get_output(self.opcodes[index], inputs))
+		return values[-1]
+
+
+class CompactInstructions:
+	"""
+	The instructions of a CompactExpression, as a read-only
+	sequence of (operation, operands) pairs built from its
+	arrays when they are read, so that compiling it (see
+	CompiledExpression.py) does not hold a tuple per
+	operation.
+	"""
+
+	def __init__(self, opcodes, offsets, children, varCount):
+		self.opcodes = opcodes
+		self.offsets = offsets
+		self.children = children
+		self.varCount = varCount
+
+	def __len__(self):
+		return len(self.opcodes)
+
+	def __getitem__(self, index):
+		if index < 0:
+			index += len(self.opcodes)
+		if not 0 <= index < len(self.opcodes):
+			raise IndexError("instruction index out of range")
+		count = self.varCount
+		operands = self.children[self.offsets[index]:self.offsets[index + 1]]
+		return self.opcodes[index], tuple([ref + count if ref >= 0 else -1 - ref for ref in operands])
+
+	def __iter__(self):
+		for index in range(len(self.opcodes)):
+			yield self[index]
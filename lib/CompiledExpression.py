@@ -0,0 +1,365 @@
+from array import array
+
+from lib.Expression import Expression
+from lib.BasicOperation import AdvancedOperation
+
+
+class CompiledExpression:
+	"""
+	Given an Expression (as defined in Expression.py), this
+	class turns its parsed Expression into a flat sequence
+	of instructions and then into a single generated Python
+	function, so that getting an output does not have to
+	walk the nested lists again.
+
+	Slots: every value the generated function handles lives
+	in a numbered slot. Slots 0 to varCount - 1 hold the
+	inputs (in the order of varsSorted) and slot varCount + i
+	holds the output of the i-th instruction. Instructions
+	are in post-order, so the last one is the output of the
+	whole Expression.
+
+	For example, "(A*B)+C" gives the instructions
+	[(42, (0, 1)), (43, (3, 2))] and the function:
+
+		def evaluate(IN, ONE=1):
+			s0, s1, s2, = IN
+			s1 = s0 & s1
+			s2 = s1 | s2
+			return s2
+
+	The generated function only uses &, |, ^ and ONE (custom
+	operators included, see Operator in BasicOperation.py),
+	so it can be given anything that supports those operators.
+	With the default ONE=1 and 0s and 1s as inputs, it
+	returns the output for that input.
+
+	A CompiledExpression can be pickled, to be evaluated in
+	other processes.
+
+	Compact expressions (see CompactExpression.py) keep their
+	instructions in the arrays of the CompactExpression, and
+	their function is made of smaller ones compiled one after
+	the other (see get_chunked_function), so that compiling
+	them takes little more memory than the arrays. They have
+	no source.
+	"""
+
+	# instructions per function of get_chunked_function
+	CHUNK_SIZE = 4096
+
+	def __init__(self, expression):
+		self.varsSorted = expression.varsSorted
+		self.varCount = expression.varCount
+		if expression.parsed is None:
+			# stored in arrays, see CompactExpression.py
+			self.instructions = expression.get_instructions()
+			self.source = None
+		else:
+			self.instructions = CompiledExpression.get_instructions(expression.parsed, self.varsSorted)
+			self.source = CompiledExpression.get_source(self.instructions, self.varCount)
+		self.evaluate = self.__get_evaluate()
+		self.__invalid = [(operation, len(operands)) for operation, operands in self.instructions if not AdvancedOperation.is_arity_valid(operation, len(operands))]
+
+	def __getstate__(self):
+		# the generated function cannot be pickled; it is
+		# generated again from its source when unpickling, so
+		# that a CompiledExpression can be sent to another process
+		state = self.__dict__.copy()
+		del state["evaluate"]
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.evaluate = self.__get_evaluate()
+
+	def __get_evaluate(self):
+		if self.source is None:
+			return CompiledExpression.get_chunked_function(self.instructions, self.varCount)
+		return CompiledExpression.get_function(self.source, "evaluate")
+
+	def assert_operations_are_valid(self):
+		"""
+		Raises the error that AdvancedOperation raises for
+		the first operation having an invalid number of
+		operands, if any. This needs to be called before
+		evaluating on anything else than 0s and 1s (masks,
+		arrays) since only those can be handed to
+		AdvancedOperation.
+		"""
+		for operation, count in self.__invalid:
+			AdvancedOperation.get_output(operation, [0] * count)
+
+	@staticmethod
+	def get_instructions(parsed, variables):
+		"""
+		Returns the list of instructions (operation, operands)
+		for the parsed Expression, where operands is a tuple
+		of slots. Values (the letters) are resolved to their
+		index in variables here, once.
+
+		Identical instructions, including ones whose operands
+		only differ in order for a commutative operation, are
+		only added once, so every shared part of the
+		Expression is computed once per evaluation.
+		"""
+		return CompiledExpression.get_shared_instructions([parsed], variables)[0]
+
+	@staticmethod
+	def get_shared_instructions(parsed_list, variables):
+		"""
+		Same as get_instructions for several parsed Expressions
+		over the same variables: returns the pair (instructions,
+		roots) where roots holds the slot of every Expression's
+		output. Identical instructions are only added once
+		across all of them, so the parts they share are
+		computed once.
+		"""
+		var_indices = {var: index for index, var in enumerate(variables)}
+		slots, instructions, shared, roots = {}, [], {}, []
+		for parsed in parsed_list:
+			for node in Expression.get_postorder_nodes(parsed):
+				operands = []
+				for child in node[1:]:
+					if type(child) == list:
+						operands.append(slots[id(child)])
+					else:
+						operands.append(var_indices[child])
+				key = (node[0], tuple(sorted(operands)) if AdvancedOperation.is_commutative(node[0]) else tuple(operands))
+				if key not in shared:
+					shared[key] = len(variables) + len(instructions)
+					instructions.append((node[0], tuple(operands)))
+				slots[id(node)] = shared[key]
+			roots.append(slots[id(parsed)])
+		return instructions, roots
+
+	@staticmethod
+	def get_source(instructions, var_count, roots=None):
+		"""
+		Returns the source code of the function evaluate(IN, ONE=1)
+		computing the given instructions one after the other.
+
+		A slot's local variable is given to a later slot once
+		the slot has been used for the last time, so that only
+		the values still needed are kept alive. This matters
+		when evaluating big expressions on masks or arrays.
+
+		The function returns the last instruction or, given
+		roots, a tuple of the values of those slots.
+		"""
+		last_uses = {}
+		for index, (_, operands) in enumerate(instructions):
+			for slot in operands:
+				last_uses[slot] = index
+		for slot in roots or []:
+			# returned at the end, so never given away
+			last_uses[slot] = len(instructions)
+		names = {slot: "s" + str(slot) for slot in range(var_count)}
+		free_names = []
+		lines = ["def evaluate(IN, ONE=1):"]
+		if var_count > 0:
+			lines.append("\t" + "".join([names[slot] + ", " for slot in range(var_count)]) + "= IN")
+		for index, (operation, operands) in enumerate(instructions):
+			code = CompiledExpression.get_operation_code(operation, [names[slot] for slot in operands])
+			for slot in set(operands):
+				if last_uses[slot] == index:
+					free_names.append(names.pop(slot))
+			slot = var_count + index
+			names[slot] = free_names.pop() if free_names else "s" + str(slot)
+			lines.append("\t" + names[slot] + " = " + code)
+		if roots is None:
+			lines.append("\treturn " + names[var_count + len(instructions) - 1])
+		else:
+			lines.append("\treturn (" + "".join([names[slot] + ", " for slot in roots]) + ")")
+		return "\n".join(lines) + "\n"
+
+	@staticmethod
+	def get_chunked_function(instructions, var_count, size=None):
+		"""
+		Returns a function evaluate(IN, ONE=1) like the one of
+		get_source, calling one after the other functions that
+		compute size instructions each (CHUNK_SIZE by default).
+		They are generated and compiled one at a time, since
+		compiling a single function of a million instructions
+		takes many times the memory of the instructions.
+
+		The values a later function needs are handed over in a
+		dictionary by slot, from which they are removed at
+		their last use.
+		"""
+		size = size or CompiledExpression.CHUNK_SIZE
+		count = len(instructions)
+		output = var_count + count - 1
+		last_uses = array("l", [-1]) * (var_count + count)
+		for index, (_, operands) in enumerate(instructions):
+			for slot in operands:
+				last_uses[slot] = index
+		# returned at the end, so never removed
+		last_uses[output] = count
+		chunks = []
+		for start in range(0, count, size):
+			source = CompiledExpression.__get_chunk_source(instructions, var_count, last_uses, start, min(start + size, count))
+			chunks.append(CompiledExpression.get_function(source, "chunk"))
+
+		def evaluate(IN, ONE=1):
+			S = dict(enumerate(IN))
+			for chunk in chunks:
+				chunk(S, ONE)
+			return S[output]
+		return evaluate
+
+	@staticmethod
+	def __get_chunk_source(instructions, var_count, last_uses, start, end):
+		"""
+		Returns the source code of the function chunk(S, ONE=1)
+		computing the instructions from start to end, taking
+		the values it needs from S and putting in S the ones
+		needed after end. Local variables are given to later
+		slots like in get_source.
+		"""
+		lines = ["def chunk(S, ONE=1):"]
+		names, free_names = {}, []
+		for index in range(start, end):
+			operation, operands = instructions[index]
+			for slot in operands:
+				if slot not in names:
+					names[slot] = "s" + str(slot)
+					# removed from S at its last use
+					method = ".pop(" if last_uses[slot] < end else ".get("
+					lines.append("\t" + names[slot] + " = S" + method + str(slot) + ")")
+			code = CompiledExpression.get_operation_code(operation, [names[slot] for slot in operands])
+			for slot in set(operands):
+				if last_uses[slot] == index:
+					free_names.append(names.pop(slot))
+			slot = var_count + index
+			names[slot] = free_names.pop() if free_names else "s" + str(slot)
+			lines.append("\t" + names[slot] + " = " + code)
+		for slot, name in names.items():
+			if slot >= var_count + start and last_uses[slot] >= end:
+				lines.append("\tS[" + str(slot) + "] = " + name)
+		return "\n".join(lines) + "\n"
+
+	@staticmethod
+	def get_operation_code(operation, names):
+		"""
+		Returns the Python code computing the operation on the
+		given operand names: the template of its Operator (see
+		BasicOperation.py) if it has one, or else a call to
+		its bitwise function. Operations with an invalid number
+		of operands (say, "A>B>C") are handed to
+		AdvancedOperation.get_output so that they fail exactly
+		like they would have without compiling.
+		"""
+		if not AdvancedOperation.is_arity_valid(operation, len(names)):
+			return "KERNEL(" + str(operation) + ", [" + ", ".join(names) + "])"
+		operator = AdvancedOperation.get_operator(operation)
+		if operator.template is not None:
+			return operator.template(names)
+		return "BITWISE[" + str(operation) + "](ONE, " + ", ".join(names) + ")"
+
+	def iter_gray_code_outputs(self):
+		"""
+		Yields (inputs, output) for every possible input,
+		in Gray code order: from one row to the next, only
+		one input changes. For instance, for 2 variables,
+		the inputs come in the order (0, 0), (0, 1), (1, 1)
+		and (1, 0).
+
+		Between two rows, only the instructions depending on
+		the input that changed are computed again. The values
+		of every slot are kept in one list, so the memory
+		used does not depend on the number of rows.
+		"""
+		count = self.varCount
+		slots = [0] * (count + len(self.instructions))
+		fill = self.get_fill_function()
+		updates = [self.__get_update_function(index) for index in range(count)]
+		output = fill(slots)
+		yield tuple(slots[:count]), output
+		for row in range(1, 2 ** count):
+			# the input flipping at row is the lowest set bit of
+			# row, the last variable being the least significant
+			output = updates[count - (row & -row).bit_length()](slots)
+			yield tuple(slots[:count]), output
+
+	def get_fill_function(self):
+		"""
+		Returns a function fill(S, ONE=1) that, given a list
+		of slots whose first varCount ones hold the inputs,
+		computes every instruction into the other slots and
+		returns the output
+		"""
+		source = self.__get_slots_source("fill", range(len(self.instructions)))
+		return CompiledExpression.get_function(source, "fill")
+
+	def get_profiled_function(self):
+		"""
+		Returns a function profile(S, TIMES, CLOCK, ONE=1) that
+		does what fill does (see get_fill_function), also adding
+		to TIMES[i] the time CLOCK measured for the i-th
+		instruction (see Instrumentation.py). Calling CLOCK
+		costs more than most instructions, so this is only
+		meant to compare them.
+		"""
+		lines = ["def profile(S, TIMES, CLOCK, ONE=1):", "\tstart = CLOCK()"]
+		for position, (operation, operands) in enumerate(self.instructions):
+			names = ["S[" + str(slot) + "]" for slot in operands]
+			code = CompiledExpression.get_operation_code(operation, names)
+			lines.append("\tS[" + str(self.varCount + position) + "] = " + code)
+			lines.append("\tend = CLOCK()")
+			lines.append("\tTIMES[" + str(position) + "] += end - start")
+			lines.append("\tstart = end")
+		lines.append("\treturn S[" + str(self.varCount + len(self.instructions) - 1) + "]")
+		return CompiledExpression.get_function("\n".join(lines) + "\n", "profile")
+
+	def get_dependent_instructions(self, index):
+		"""
+		Returns the indices, in order, of the instructions
+		whose output depends on the input at the given index
+		"""
+		dirty, dependents = {index}, []
+		for position, (operation, operands) in enumerate(self.instructions):
+			if any(slot in dirty for slot in operands):
+				dirty.add(self.varCount + position)
+				dependents.append(position)
+		return dependents
+
+	def __get_update_function(self, index):
+		"""
+		Returns a function flipping the input at the given
+		index in a list of slots and computing again only
+		the instructions depending on it
+		"""
+		positions = self.get_dependent_instructions(index)
+		source = self.__get_slots_source("update", positions, "\tS[" + str(index) + "] ^= ONE")
+		return CompiledExpression.get_function(source, "update")
+
+	def __get_slots_source(self, name, positions, first_line=None):
+		"""
+		Returns the source code of a function computing the
+		instructions at the given positions in the list of
+		slots S, and returning the output of the expression
+		"""
+		lines = ["def " + name + "(S, ONE=1):"]
+		if first_line is not None:
+			lines.append(first_line)
+		for position in positions:
+			operation, operands = self.instructions[position]
+			names = ["S[" + str(slot) + "]" for slot in operands]
+			code = CompiledExpression.get_operation_code(operation, names)
+			lines.append("\tS[" + str(self.varCount + position) + "] = " + code)
+		lines.append("\treturn S[" + str(self.varCount + len(self.instructions) - 1) + "]")
+		return "\n".join(lines) + "\n"
+
+	@staticmethod
+	def get_function(source, name):
+		"""
+		Runs generated source code and returns the function
+		with the given name that it defines. The code can call
+		KERNEL (AdvancedOperation.get_output) and BITWISE, the
+		bitwise function of every Operator by code.
+		"""
+		bitwise = {code: operator.get_bitwise() for code, operator in AdvancedOperation.OPERATORS.items()}
+		namespace = {"KERNEL": AdvancedOperation.get_output, "BITWISE": bitwise}
+		exec(compile(source, "<CompiledExpression>", "exec"), namespace)
+		return namespace[name]
@@ -0,0 +1,87 @@
+from lib.BasicOperation import AdvancedOperation
+
+
+class ConstantFolder:
+	"""
+	Specializes a compiled expression (see CompiledExpression.py)
+	for inputs known ahead of time: those inputs become the
+	constants 0 and 1, which are folded through every operation
+	they reach, from the inputs up:
+	- AND, OR, NAND and NOR: a controlling constant (0 for AND
+		and NAND, 1 for OR and NOR) decides the output, and the
+		other constants are dropped
+	- XOR: the constants are dropped, and the rest is NOTed if
+		an odd number of them were 1
+	- IFF, IMPLIES and NOT: each constant case comes down to a
+		constant, the other operand or its NOT
+	- other operators: their controlling value decides the
+		output; otherwise, their constants are kept, written
+		with a variable that is not fixed, as V*(!V) or V+(!V)
+
+	The result is a parsed Expression (see Expression.py) over
+	the variables that are not fixed, a single Value, or the
+	constant 0 or 1. Shared parts of the compiled expression
+	stay shared in it.
+	"""
+
+	NOT = ord(AdvancedOperation.SYMBOLS["NOT"])
+	AND = ord(AdvancedOperation.SYMBOLS["AND"])
+	OR = ord(AdvancedOperation.SYMBOLS["OR"])
+
+	@staticmethod
+	def fold(compiled, values):
+		"""
+		Returns the folded expression of compiled when the
+		variables in values (a dictionary mapping names to 1s
+		and 0s) are fixed
+		"""
+		compiled.assert_operations_are_valid()
+		slots = [values.get(name, name) for name in compiled.varsSorted]
+		free = [name for name in compiled.varsSorted if name not in values]
+		for operation, operands in compiled.instructions:
+			slots.append(ConstantFolder.__fold_operation(operation, [slots[slot] for slot in operands], free))
+		return slots[-1]
+
+	@staticmethod
+	def __fold_operation(operation, operands, free):
+		constants = [operand for operand in operands if type(operand) == int]
+		if len(constants) == 0:
+			return [operation] + operands
+		if len(constants) == len(operands):
+			return AdvancedOperation.get_output(operation, constants)
+		others = [operand for operand in operands if type(operand) != int]
+		operator = AdvancedOperation.get_operator(operation)
+		name = operator.name
+		if name == "NOT":
+			return ConstantFolder.make_NOT(others[0])
+		if operator.controlling is not None and operator.controlling in constants:
+			return operator.controlled
+		if name in ("AND", "OR", "NAND", "NOR"):
+			node = others[0] if len(others) == 1 else [operation] + others
+			return ConstantFolder.make_NOT(node) if name in ("NAND", "NOR") and len(others) == 1 else node
+		if name == "XOR":
+			node = others[0] if len(others) == 1 else [operation] + others
+			return ConstantFolder.make_NOT(node) if sum(constants) % 2 == 1 else node
+		if name == "IFF":
+			return others[0] if constants[0] == 1 else ConstantFolder.make_NOT(others[0])
+		if name == "IMPLIES":
+			# 0,1 => 0 and everything else => 1
+			if type(operands[0]) == int:
+				return 1 if operands[0] == 1 else ConstantFolder.make_NOT(operands[1])
+			return 1 if operands[1] == 0 else operands[0]
+		return [operation] + [ConstantFolder.__make_constant(operand, free[0]) if type(operand) == int else operand for operand in operands]
+
+	@staticmethod
+	def make_NOT(node):
+		"""
+		Returns the NOT of node, removing a double NOT
+		"""
+		if type(node) == list and node[0] == ConstantFolder.NOT:
+			return node[1]
+		return [ConstantFolder.NOT, node]
+
+	@staticmethod
+	def __make_constant(value, name):
+		if value == 1:
+			return [ConstantFolder.OR, name, [ConstantFolder.NOT, name]]
+		return [ConstantFolder.AND, name, [ConstantFolder.NOT, name]]
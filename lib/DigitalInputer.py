@@ -1,5 +1,26 @@
+import io
+import sys
+import itertools
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from lib.BasicOperation import InputAsserter
+from lib.ExpressionCache import ExpressionCache
+from lib.TruthTable import TruthTable
+from lib.TruthTableFile import TruthTableWriter
+from lib.TableWriter import TableWriter
+from lib.LazyEvaluator import LazyEvaluator
+from lib.CircuitSimulator import CircuitSimulator
+from lib.Minimizer import Minimizer
+from lib.ConstantFolder import ConstantFolder
+from lib.SpecializedInputer import SpecializedInputer
 from lib.Expression import Expression
-from lib.BasicOperation import AdvancedOperation
+from lib.EquivalenceChecker import EquivalenceChecker
+from lib.BinaryDecisionDiagram import BinaryDecisionDiagram, BddFunction
+from lib.Instrumentation import Instrumentation
 
 class DigitalInputer:
 	"""
@@ -27,17 +48,73 @@ class DigitalInputer:
 		directly from this dictionary.
 	- print_output_table(): prints the output table received
 		from get_output_table_print_ready()
+	- write_output_table(file, format="text"): writes the
+		output table to a file-like object, row by row, as
+		text, Markdown, CSV or JSON Lines.
+	- get_output(input_array, lazy=True): the same, stopping
+		AND and OR operations at their first deciding input.
+	- get_simulator(): returns a simulator whose inputs can
+		be changed one at a time, computing again only what
+		depends on them.
+	- get_outputs(inputs): given a 2-D NumPy array with one
+		input per row, returns the output of every row.
+	- iter_output_table(gray_code=False): yields every
+		(inputs, output) pair one at a time.
+	- get_truth_table(): returns the outputs of every
+		possible input as a TruthTable (see TruthTable.py),
+		packed one bit per input
+	- get_bdd(): returns the expression as a binary decision
+		diagram (see BinaryDecisionDiagram.py)
+	- specialize(values): returns a SpecializedInputer over
+		the other inputs, with the given ones fixed and folded in
+	- minimize(): returns an equivalent raw sum of products
+	- is_satisfiable(), is_tautology(): whether some input,
+		or every input, gives 1. find_satisfying_input()
+		returns such an input.
+	- count_true_inputs(), output_probability(biases): the
+		number of inputs giving 1, and the probability of a 1
+		when every input is 1 with its own probability.
+	- write_truth_table(path): writes the truth table to
+		a file that TruthTableFile (see TruthTableFile.py)
+		reads without loading it
+	- get_stats(): counters and timings of parsing,
+		validating and evaluating, once Instrumentation (see
+		Instrumentation.py) is enabled, and the statistics of
+		CACHE
 	"""
 
-	def __init__(self, raw):
+	# parsed and compiled expressions shared by every
+	# DigitalInputer; see ExpressionCache.py to resize
+	# it, clear it or get its statistics
+	CACHE = ExpressionCache()
+	# up to this many variables, counts and probabilities
+	# come from the truth table instead of a BDD
+	TABLE_LIMIT = 16
+
+	def __init__(self, raw, compact=False):
 		"""
 		All that is needed for the initialization
 		is a raw expression. This raw expression
 		is an expression as defined in Expression.py
+
+		The parsed Expression is compiled here, once,
+		into a function (see CompiledExpression.py) so
+		that getting an output does not walk the parsed
+		Expression every time. Both are kept in
+		DigitalInputer.CACHE (see ExpressionCache.py), so
+		building the same raw again is almost free.
+
+		With compact=True, the Expression is stored in
+		flat arrays (see CompactExpression.py), which takes
+		much less memory for very big expressions.
 		"""
-		self.expression = Expression(raw)
+		self.raw = raw
+		self.expression, self.compiled = DigitalInputer.CACHE.get(raw, compact)
+		self.__truth_table = None
+		self.__lazy_evaluator = None
+		self.__profiled = None
 
-	def get_output(self, array):
+	def get_output(self, array, lazy=False):
 		"""
 		Given an input as an array (for example, "[0,1]"),
 		this  returns whatever the output needs to be. The
@@ -50,64 +127,133 @@ class DigitalInputer:
 		This is a design decision that is more convenient
 		in place of defining an obscure logic to the
 		mapping of the variables in the expression.
+		Variables named with numbers come in natural order
+		(x2 before x10; see Expression.sort_variables). The
+		input can also be a dictionary mapping every name
+		to its input, such as {"clk": 1, "x17": 0}.
+
+		With lazy=True, AND, OR, NAND and NOR stop at their
+		first controlling input, trying the cheapest and most
+		often deciding ones first (see get_lazy_evaluator).
+		"""
+		if Instrumentation.ENABLED:
+			return self.__get_instrumented_output(array, lazy)
+		if isinstance(array, dict):
+			array = self.__get_array(array)
+		self.__assert_array_length_is_valid(array)
+		DigitalInputer.__assert_array_values_are_valid(array)
+		if lazy:
+			return self.get_lazy_evaluator().evaluate(array)
+		return self.compiled.evaluate(array)
+
+	def __get_instrumented_output(self, array, lazy):
 		"""
+		Same as get_output, recording the time spent
+		validating and evaluating (see Instrumentation.py)
+		"""
+		start = Instrumentation.CLOCK()
+		if isinstance(array, dict):
+			array = self.__get_array(array)
 		self.__assert_array_length_is_valid(array)
-		return self.__solve_output_for_input(array, self.expression.parsed)
+		DigitalInputer.__assert_array_values_are_valid(array)
+		validated = Instrumentation.CLOCK()
+		if lazy:
+			output = self.get_lazy_evaluator().evaluate(array)
+		elif Instrumentation.PROFILING:
+			if self.__profiled is None:
+				self.compiled.assert_operations_are_valid()
+				self.__profiled = self.compiled.get_profiled_function()
+			times = Instrumentation.get_profile_times(self.raw, self.compiled)
+			output = self.__profiled(list(array) + [0] * len(self.compiled.instructions), times, Instrumentation.CLOCK)
+		else:
+			output = self.compiled.evaluate(array)
+		end = Instrumentation.CLOCK()
+		if not lazy:
+			Instrumentation.count_rows(self.raw, self.compiled, 1)
+		Instrumentation.record("validate", validated - start)
+		Instrumentation.record("evaluate", end - validated, 1)
+		return output
 
-	def __solve_output_for_input(self, input_array, parsed_expression):
+	def get_lazy_evaluator(self):
 		"""
-		Given an input_array, this will given an output
-		based on the parsed expression
+		Returns the LazyEvaluator (see LazyEvaluator.py) used
+		by get_output(array, lazy=True). It is adaptive: it
+		keeps observing which inputs decide the output and
+		reorders them accordingly.
 		"""
-		operation = DigitalInputer.__get_operation(parsed_expression)
-		inputs = self.__get_digital_inputs(input_array, parsed_expression)
-		return AdvancedOperation.get_output(operation, inputs)
+		if self.__lazy_evaluator is None:
+			self.__lazy_evaluator = LazyEvaluator(self.compiled, adaptive=True)
+		return self.__lazy_evaluator
+
+	def get_simulator(self, inputs=None):
+		"""
+		Returns a CircuitSimulator (see CircuitSimulator.py)
+		of the expression, starting from the given inputs (all
+		0s by default). Changing one of its inputs with
+		set_input or flip_input only computes again the part
+		of the expression that depends on it.
+		"""
+		return CircuitSimulator(self.compiled, inputs)
 
 	@staticmethod
-	def __get_operation(parsed_expression):
+	def get_stats():
 		"""
-		Returns the operation of a parsed Expression,
-		which is always in the first index of the
-		Expression
+		Returns what Instrumentation (see Instrumentation.py)
+		recorded since it was enabled, along with the
+		statistics of CACHE under "cache". Nothing but the
+		cache is recorded until Instrumentation.enable()
+		is called.
 		"""
-		return parsed_expression[0]
+		return Instrumentation.get_stats(DigitalInputer.CACHE)
 
-	def __get_digital_inputs(self, input_array, parsed_expression):
+	def get_outputs(self, inputs):
 		"""
-		returns an array containing 0's and 1's based on
-		the input_array and parsed expression.
+		Given a 2-D NumPy array of 0s and 1s (integers or
+		booleans) with one input per row, this returns a
+		1-D uint8 array with the output of every row. The
+		columns are in Alphabetical order, like the inputs
+		of get_output.
 
-		If parsed_expression is [33, "A"] and input_array
-		is [0], then it'll return [0]. The not operation
-		(33) is to be done elsewhere, not here.
+		The whole batch is validated once and every operation
+		is done on entire columns at once. This needs NumPy.
 		"""
-		inputs = []
-		# ignore the operator, which is always the first element
-		for expr in parsed_expression[1:]:
-			if DigitalInputer.__is_value(expr):
-				# map the expression to the actual value
-				inputs.append(self.__map_to_digital_input(input_array, expr))
-			else:
-				# solve for the given expression
-				inputs.append(self.__solve_output_for_input(input_array, expr))
-		return inputs
+		if numpy is None:
+			raise ImportError("get_outputs requires numpy to be installed")
+		instrumented = Instrumentation.ENABLED
+		if instrumented:
+			start = Instrumentation.CLOCK()
+		InputAsserter.assert_matrix_is_valid(inputs, self.expression.varCount)
+		self.compiled.assert_operations_are_valid()
+		# one contiguous row per variable
+		columns = numpy.ascontiguousarray(inputs.T, dtype=numpy.uint8)
+		if not instrumented:
+			return self.compiled.evaluate(columns, numpy.uint8(1))
+		validated = Instrumentation.CLOCK()
+		outputs = self.compiled.evaluate(columns, numpy.uint8(1))
+		Instrumentation.count_rows(self.raw, self.compiled, len(inputs))
+		Instrumentation.record("validate", validated - start)
+		Instrumentation.record("evaluate", Instrumentation.CLOCK() - validated, len(inputs))
+		return outputs
 
-	@staticmethod
-	def __is_value(expression):
+	def __get_array(self, inputs):
 		"""
-		Checks whether the given expression is a
-		Value (an alphabetical letter) ASA or an
-		Expression ASA
+		Returns the inputs given by name as an array in the
+		order of varsSorted
 		"""
-		return type(expression) != list
+		for name in self.expression.varsSorted:
+			assert name in inputs, "Missing input for variable: " + name
+		assert len(inputs) == self.expression.varCount, "The length of the array must equal the number of variables in the expression"
+		return [inputs[name] for name in self.expression.varsSorted]
 
-	def __map_to_digital_input(self, input_array, expr):
+	@staticmethod
+	def __assert_array_values_are_valid(array):
 		"""
-		Maps a digital value, say "A", to an input
-		value.
+		Every value in the array must be 1 or 0. This
+		is checked once per call instead of once per
+		operation.
 		"""
-		index = self.expression.varsSorted.index(expr)
-		return input_array[index]
+		for IN in array:
+			InputAsserter.assert_input(IN)
 
 	def __assert_array_length_is_valid(self, array):
 		"""
@@ -117,47 +263,195 @@ class DigitalInputer:
 		msg = "The length of the array must equal the number of variables in the expression"
 		assert len(array) == self.expression.varCount, msg
 
-	def get_table_output_dictionary(self):
+	def get_bdd(self, manager=None, order=None, reorder=False):
+		"""
+		Returns the expression as a BddFunction, a reduced
+		ordered binary decision diagram (see
+		BinaryDecisionDiagram.py), where getting an output
+		takes at most one step per variable.
+
+		Functions built in the same manager are equal if and
+		only if their expressions are equivalent. Without a
+		manager, a new one is made over the variables of the
+		expression, tested in the given order (Alphabetical
+		order by default) or, with reorder=True, in an order
+		found by sifting.
+		"""
+		if manager is None:
+			manager = BinaryDecisionDiagram(self.expression.varsSorted, order)
+		else:
+			assert order is None and not reorder, "order and reorder can only be used without a manager"
+		node = manager.build(self.compiled)
+		if reorder:
+			manager.reorder([node])
+		return BddFunction(manager, node)
+
+	def specialize(self, values):
+		"""
+		Returns a SpecializedInputer (see SpecializedInputer.py)
+		for the inputs in values (a dictionary mapping names to
+		1s and 0s) being fixed: its expression is this one with
+		those inputs folded in as constants (see
+		ConstantFolder.py), so getting its outputs does less
+		work. It takes the other inputs in the same order, even
+		those the output no longer depends on.
+		"""
+		assert type(values) == dict, "values must be a dictionary mapping names to inputs"
+		for name, value in values.items():
+			assert name in self.expression.varsSorted, "Unknown variable: " + str(name)
+			InputAsserter.assert_input(value)
+		folded = ConstantFolder.fold(self.compiled, values)
+		free = [name for name in self.expression.varsSorted if name not in values]
+		if type(folded) == int:
+			return SpecializedInputer(free, values, constant=folded)
+		return SpecializedInputer(free, values, DigitalInputer(Expression.to_raw(folded), self.expression.parsed is None))
+
+	def minimize(self):
+		"""
+		Returns a raw sum of products (see Minimizer.py)
+		giving the same outputs, usually shorter and faster
+		to evaluate. It only holds the variables the output
+		depends on.
+		"""
+		return Minimizer.minimize(self.get_truth_table())
+
+	def find_satisfying_input(self):
+		"""
+		Returns an input (an array in the order of varsSorted)
+		giving 1, or None if the output is always 0. Past a
+		few variables, this goes to the SAT solver (see
+		EquivalenceChecker.find_input) instead of going
+		through every input.
+		"""
+		found = EquivalenceChecker.find_input(self.compiled, 1)
+		if found is None:
+			return None
+		return [found[name] for name in self.expression.varsSorted]
+
+	def is_satisfiable(self):
+		"""
+		Returns True if some input gives 1
+		"""
+		return self.find_satisfying_input() is not None
+
+	def is_tautology(self):
+		"""
+		Returns True if every input gives 1
+		"""
+		return EquivalenceChecker.find_input(self.compiled, 0) is None
+
+	def count_true_inputs(self):
+		"""
+		Returns the number of inputs giving 1. With up to
+		TABLE_LIMIT variables, the 1s of the truth table are
+		counted; otherwise they are counted on a BDD (see
+		get_bdd), in time linear in its number of nodes. Its
+		variables are tested in the order the expression uses
+		them (see BinaryDecisionDiagram.get_structural_order),
+		which keeps it small on circuits like adders.
+		"""
+		if self.expression.varCount <= DigitalInputer.TABLE_LIMIT:
+			return self.get_truth_table().count()
+		return self.__get_counting_bdd().count()
+
+	def output_probability(self, biases):
+		"""
+		Returns the probability that the output is 1 when
+		every input is 1 with its own probability, given in
+		biases (a list in the order of varsSorted, or a
+		dictionary by name), independently of the others.
+		Like count_true_inputs, this uses the truth table
+		or the BDD, depending on the number of variables.
+		"""
+		if isinstance(biases, dict):
+			biases = [biases[name] for name in self.expression.varsSorted]
+		assert len(biases) == self.expression.varCount, "There must be one bias per variable"
+		for bias in biases:
+			assert 0 <= bias <= 1, "biases must be between 0 and 1. Received: " + str(bias)
+		if self.expression.varCount <= DigitalInputer.TABLE_LIMIT:
+			return self.get_truth_table().get_probability(biases)
+		return self.__get_counting_bdd().get_probability(biases)
+
+	def __get_counting_bdd(self):
+		return self.get_bdd(order=BinaryDecisionDiagram.get_structural_order(self.compiled))
+
+	def get_table_output_dictionary(self, processes=None):
 		"""
 		Returns a dictionary mapping tuples of inputs
 		(e.g.: (0,0,1)) to digital value outputs.
 
 		For some reason, the order in which they come
 		is shuffle, but that's okay.
+
+		This holds a tuple per input; get_truth_table()
+		holds the same outputs in a packed bit vector.
+		processes is passed on to get_truth_table().
 		"""
-		array_inputs_list = DigitalInputer.__get_array_inputs_list(self.expression.varCount)
-		dic = {}
-		for array_input in array_inputs_list:
-			dic[tuple(array_input)] = self.get_output(array_input)
-		return dic
+		return self.get_truth_table(processes).to_dict()
 
-	@staticmethod
-	def __get_array_inputs_list(count):
+	def get_truth_table(self, processes=None):
 		"""
-		Given a count, say N, this will return an array
-		of binary digits ranging from 0 to 2^N - 1. For
-		example, if count = 2, then the output will be
-		[[0,0], [0,1], [1,0], [1,1]]
+		Returns the TruthTable (see TruthTable.py) of the
+		expression: the outputs of every row, as a single
+		bit vector. It is computed once, block by block,
+		and reused by the other table methods.
+
+		With processes, the blocks are split into contiguous
+		ranges computed by a pool of that many processes,
+		and merged in order. This pays off from about 20
+		variables on.
 		"""
-		array_inputs_list = []
-		max_number = 2 ** count
-		for number in range(max_number):
-			array_inputs_list.append(DigitalInputer.__array_from_binary(bin(number), count))
-		return array_inputs_list
+		if self.__truth_table is None:
+			instrumented = Instrumentation.ENABLED
+			if instrumented:
+				start = Instrumentation.CLOCK()
+			self.__truth_table = TruthTable.from_compiled(self.compiled, processes)
+			if instrumented:
+				rows = 2 ** self.expression.varCount
+				Instrumentation.count_rows(self.raw, self.compiled, rows)
+				Instrumentation.record("table", Instrumentation.CLOCK() - start, rows)
+		return self.__truth_table
+
+	def write_truth_table(self, path, processes=None):
+		"""
+		Writes the truth table to a file at path, block by
+		block, without holding the whole table in memory.
+		Open it with TruthTableFile(path) to look outputs up
+		from any process. processes works like in
+		get_truth_table().
+		"""
+		TruthTableWriter.write_compiled(path, self.compiled, processes)
+
+	def iter_output_table(self, gray_code=False):
+		"""
+		Yields (inputs, output) for every possible input,
+		one row at a time, where inputs is a tuple such as
+		(0,0,1). Nothing is computed ahead, so this can walk
+		tables too big to be held in memory.
+
+		By default, the rows come in the same order as in
+		get_output_table_print_ready(). With gray_code=True,
+		they come in Gray code order instead: only one input
+		changes from a row to the next, and only the parts
+		of the expression depending on it are computed again.
+		"""
+		if gray_code:
+			return self.compiled.iter_gray_code_outputs()
+		return self.__iter_output_table()
+
+	def __iter_output_table(self):
+		for array_input in DigitalInputer.__iter_array_inputs(self.expression.varCount):
+			yield array_input, self.compiled.evaluate(array_input)
 
 	@staticmethod
-	def __array_from_binary(binary_number, var_count):
+	def __iter_array_inputs(count):
 		"""
-		Given a binary number "0bxx...x", this returns
-		the array [x, x, x, ..., x] where each x in
-		an integer that is either 1 or 0
+		Given a count, say N, this will yield tuples of
+		binary digits ranging from 0 to 2^N - 1. For
+		example, if count = 2, then it yields (0,0),
+		(0,1), (1,0) and (1,1)
 		"""
-		attempt = [int(IN) for IN in binary_number[2:]]
-		while (len(attempt)) < var_count:
-			# the length needs to be as long as var_count
-			# so if it's not, insert, at index 0, a 0
-			attempt.insert(0, 0)
-		return attempt
+		return itertools.product((0, 1), repeat=count)
 
 	def get_output_table_print_ready(self):
 		"""
@@ -166,45 +460,47 @@ class DigitalInputer:
 		and every possible combination of outputs for
 		the given inputs
 		"""
-		array_inputs_list = DigitalInputer.__get_array_inputs_list(self.expression.varCount)
-		string = "\n" + DigitalInputer.__print_output_table_line(self.expression.varsSorted, "OUT")
-		for array_input in array_inputs_list:
-			string += "\n" + DigitalInputer.__print_output_table_line(array_input, self.get_output(array_input))
-		return string
+		string = io.StringIO()
+		self.write_output_table(string)
+		return string.getvalue()
 
-	@staticmethod
-	def __print_output_table_line(expression_values, output):
+	def write_output_table(self, file, format="text"):
 		"""
-		Returns a string containing the line, as needed,
-		for the output table. expression_values should
-		have the length of self.expression.varCount and
-		is an array of either alphabetical letters or
-		digital input values output is either a string
-		or an integer
+		Writes the output table to a file-like object, such
+		as an open text file, as its rows are computed, so
+		tables too big to be held in memory can be written.
+		format is "text" (the layout of print_output_table),
+		"markdown", "csv" or "jsonl"; see TableWriter.py.
 		"""
-		string = ""
-		for expr in expression_values:
-			string += str(expr) + " "
-		string += "| " + str(output)
-		return string
+		TableWriter(file, self.expression.varsSorted, format).write_table(self.__iter_table_rows())
+
+	def __iter_table_rows(self):
+		array_inputs = DigitalInputer.__iter_array_inputs(self.expression.varCount)
+		if self.__truth_table is not None:
+			return zip(array_inputs, self.__truth_table.iter_outputs())
+		# computed one block at a time, without keeping the table
+		return zip(array_inputs, TruthTable.iter_compiled_outputs(self.compiled))
 
 	def print_output_table(self):
 		"""
-		Prints the output table
+		Prints the output table, row by row
 		"""
-		print(self.get_output_table_print_ready())
+		self.write_output_table(sys.stdout)
+		sys.stdout.write("\n")
 
 	def __str__(self):
-		return str(self.expression.raw)
+		return str(self.raw)
 
 	def __repr__(self):
-		return str(self.expression.raw)
+		return str(self.raw)
 
 	def __eq__(self, other):
 		if type(other) == str:
 			# assumes that other is just a string of raw
 			# and self with the DigitalInputer of other
 			return self == DigitalInputer(other)
+		if isinstance(other, TruthTable):
+			return self.get_truth_table() == other
 		if isinstance(other, self.__class__):
 			# we need to compare both outputs and string raw
 			return self.__are_raw_equal(other) or self.__are_outputs_equal(other)
@@ -214,23 +510,10 @@ class DigitalInputer:
 		return self.expression.raw == other.expression.raw
 
 	def __are_outputs_equal(self, other):
-		# pre-compute the dictionaries because they
-		# may take a long time to compute
-		other_output = other.get_table_output_dictionary()
-		other_output_keys = other_output.keys()
-		self_output = self.get_table_output_dictionary()
-
-		for key in other_output_keys:
-			# try/except KeyError because if other has
-			# more or less variables than A, so its
-			# inputs tuples will definitely not be part
-			# of the dictionary from self
-			try:
-				if self_output[key] != other_output[key]:
-					return False
-			except KeyError:
-				return False
-		return True
+		# variables are matched by name, so "A" and
+		# "A*(B+(!B))" are equal while "A+B" and
+		# "C+D" are not. See EquivalenceChecker.py
+		return EquivalenceChecker.are_equivalent(self.compiled, other.compiled)
 
 	def __ne__(self, other):
 		return not self.__eq__(other)
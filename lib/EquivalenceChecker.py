@@ -0,0 +1,126 @@
+import random
+
+from lib.TruthTable import TruthTable
+from lib.CnfEncoder import CnfEncoder
+from lib.SatSolver import SatSolver
+
+
+class EquivalenceChecker:
+	"""
+	Decides whether two compiled expressions (see
+	CompiledExpression.py) give the same output for every
+	input. Variables are matched by name: a variable that
+	only one of the expressions uses is one the other
+	expression's output does not depend on.
+
+	- With few variables in total, both expressions are
+		evaluated with bitslicing (see TruthTable.py) over
+		the union of their variables and compared.
+	- Otherwise, both expressions are first evaluated with
+		bitslicing on a batch of random inputs, which is
+		enough to tell most different expressions apart.
+		Then, the miter of both expressions (their outputs
+		XORed together) is encoded into CNF (see CnfEncoder.py)
+		and given to the SAT solver (see SatSolver.py). They
+		are equivalent if and only if the miter can never
+		output 1, which the solver usually finds out without
+		going through every input.
+
+	find_input looks for an input giving an output in the
+	same way, which tells whether an expression can be 1
+	(is satisfiable) or is always 1 (is a tautology).
+	"""
+
+	# up to this many variables, truth tables are compared
+	BITSLICE_LIMIT = 16
+	# number of random inputs tried before calling the solver
+	SAMPLE_SIZE = 1024
+
+	@staticmethod
+	def are_equivalent(first, second):
+		"""
+		Returns True if first and second always give
+		the same output
+		"""
+		first.assert_operations_are_valid()
+		second.assert_operations_are_valid()
+		variables = sorted(set(first.varsSorted) | set(second.varsSorted))
+		if len(variables) <= EquivalenceChecker.BITSLICE_LIMIT:
+			return EquivalenceChecker.__are_tables_equal(first, second, variables)
+		if not EquivalenceChecker.__are_samples_equal(first, second, variables):
+			return False
+		return EquivalenceChecker.find_difference(first, second) is None
+
+	@staticmethod
+	def find_difference(first, second):
+		"""
+		Returns a dictionary mapping the name of every variable
+		to a value for which first and second give different
+		outputs, or None if there are none
+		"""
+		encoder = CnfEncoder()
+		first_output = encoder.encode(first)
+		second_output = encoder.encode(second)
+		# the miter: exactly one of both outputs is 1
+		encoder.clauses.append([first_output, second_output])
+		encoder.clauses.append([-first_output, -second_output])
+		model = SatSolver(encoder.clauses, encoder.varCount).solve()
+		if model is None:
+			return None
+		return {name: model[variable] for name, variable in encoder.variables.items()}
+
+	@staticmethod
+	def find_input(compiled, output=1):
+		"""
+		Returns a dictionary mapping the name of every variable
+		to a value for which compiled gives the given output,
+		or None if there are none. Like are_equivalent, this
+		goes through the truth table with few variables, then
+		through random inputs and only then to the SAT solver.
+		"""
+		compiled.assert_operations_are_valid()
+		variables = compiled.varsSorted
+		count = compiled.varCount
+		if count <= EquivalenceChecker.BITSLICE_LIMIT:
+			full = (1 << (2 ** count)) - 1
+			masks = [TruthTable.get_variable_mask(index, count) for index in range(count)]
+		else:
+			generator = random.Random(0)
+			full = (1 << EquivalenceChecker.SAMPLE_SIZE) - 1
+			masks = [generator.getrandbits(EquivalenceChecker.SAMPLE_SIZE) for _ in range(count)]
+		bits = compiled.evaluate(masks, full)
+		if output == 0:
+			bits = bits ^ full
+		if bits != 0:
+			# the lowest row or sample giving that output
+			row = (bits & -bits).bit_length() - 1
+			return {name: (masks[index] >> row) & 1 for index, name in enumerate(variables)}
+		if count <= EquivalenceChecker.BITSLICE_LIMIT:
+			return None
+		encoder = CnfEncoder()
+		literal = encoder.encode(compiled)
+		encoder.clauses.append([literal if output == 1 else -literal])
+		model = SatSolver(encoder.clauses, encoder.varCount).solve()
+		if model is None:
+			return None
+		return {name: model[encoder.get_variable(name)] for name in variables}
+
+	@staticmethod
+	def __are_tables_equal(first, second, variables):
+		count = len(variables)
+		masks = {name: TruthTable.get_variable_mask(index, count) for index, name in enumerate(variables)}
+		return EquivalenceChecker.__are_outputs_equal(first, second, masks, (1 << (2 ** count)) - 1)
+
+	@staticmethod
+	def __are_samples_equal(first, second, variables):
+		# bit i of every mask is the value of that variable in sample i
+		generator = random.Random(0)
+		size = EquivalenceChecker.SAMPLE_SIZE
+		masks = {name: generator.getrandbits(size) for name in variables}
+		return EquivalenceChecker.__are_outputs_equal(first, second, masks, (1 << size) - 1)
+
+	@staticmethod
+	def __are_outputs_equal(first, second, masks, full):
+		first_bits = first.evaluate([masks[name] for name in first.varsSorted], full)
+		second_bits = second.evaluate([masks[name] for name in second.varsSorted], full)
+		return first_bits == second_bits
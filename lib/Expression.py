@@ -1,4 +1,5 @@
-from ExpressionAsserter import ExpressionAsserter
+from lib.ExpressionAsserter import ExpressionAsserter
+from lib.BasicOperation import AdvancedOperation
 
 
 class Expression:
@@ -9,7 +10,9 @@ class Expression:
 	Naming convention:
 	- ASA: replaces "as stated above". This is to make it apparent
 		that we're referencing a variable in this naming convention.
-	- Value: Alphabetical letter
+	- Value: An uppercase letter, or an identifier starting with
+		a lowercase letter or _, followed by letters, digits and _,
+		and optionally an index in brackets: x17, clk_en or in[42]
 	- Expression: Either a Value ASA or a parsed valued array, such
 		as [33, 'A'] or [42, 'A', 'B'] (not A) and (A and B)
 		respectively
@@ -50,89 +53,142 @@ class Expression:
 	- \> means IMPLIES
 	- ^ means XOR
 	- | means IFF
+	- any other symbol registered with AdvancedOperation.register
+		(see Operator in BasicOperation.py)
 	"""
 
 	def __init__(self, raw):
 		# raw: [String] has the form "(A*B)+!(AC+B)"
 		self.LRANGE = range(0, len(raw))
-		# run assertion to make sure parameter given is ok
-		ExpressionAsserter.assert_raw_is_valid(raw)
+		# checks that the string parameter given is valid
+		assert type(raw) == str, "raw must be a string"
 		# initialize raw string and variables
 		self.raw = raw
-		# add the list of variables
 		self.vars = {}
-		self.extract_variables()
-		self.varsSorted = sorted([value for value in self.vars.keys()])
-		# create the parsed expression
+		# validate raw, add the list of variables and create
+		# the parsed expression, all in one pass
 		self.parsed = None
-		self.__create_parsed_expression()
+		self.__parse()
+		self.varsSorted = Expression.sort_variables(self.vars.keys())
+		# index of every Value in varsSorted, by name
+		self.varIndex = {var: index for index, var in enumerate(self.varsSorted)}
 
 		self.varCount = len(self.vars.keys())
 
-	def extract_variables(self):
-		for index in self.LRANGE:
-			char = self.__get_char_at(index)
-			self.__add_variable_if_valid(char, index)
-
-	def __add_variable_if_valid(self, char, index):
-		if (ExpressionAsserter.is_in_alphabet(char)):
-			self.__add_variable_position(char, index)
-
-	def __get_char_at(self, index):
-		return self.raw[index]
-
 	def __add_variable_position(self, char, index):
 		try:
 			self.vars[char].append(index)
 		except:
 			self.vars[char] = [index]
 
-	def __create_parsed_expression(self):
-		# initialize and compute parsed
-		self.parsed = Expression.__get_next_expression(self.raw)
-
-	# This functions is a recursive one that returns a
-	# parsed expression from the substring. It's the main
-	# thing that Expression does.
-	@staticmethod
-	def __get_next_expression(raw_substring):
-		L, index = len(raw_substring), 0
-		# expression stack is an array containing the expressions
-		# operator is the operation for this set of expressions in
-		# the stack
-		expression_stack, operation = [], None
-		while index < L:
-			# do something with the indexes
-			char = raw_substring[index]
-			if (ExpressionAsserter.is_in_alphabet(char)):
-				# add this character into the expression_stack
-				expression_stack.append(char)
-			elif (ExpressionAsserter.is_opening_parenthesis(char)):
-				# find the closing index and get the substring,
-				# from which we find the parsed expression
-				closing_index = Expression.find_closing_parenthesis_from(raw_substring, index)
-				sub_raw_substring = raw_substring[index + 1:closing_index]
-				# append the expression in the parentheses to the stack
-				expression_stack.append(Expression.__get_next_expression(sub_raw_substring))
-				# set the index to the closing parenthesis
-				index = closing_index
-			elif (ExpressionAsserter.is_operator(char)):
-				# set the operation if we find the operation
-				# there should be only one, so this method raises
-				# an error in case the operation is already set
-				operation = Expression.__get_operation(operation, char)
-			# increase the index at the end or set it
-			# to the end parenthesis index
-			index = index + 1
-
-		# make sure this operation follows the guidelines as stated above
-		Expression.__assert_operation_is_valid(operation, expression_stack, raw_substring)
-
-		# return an array containing at the first index the operation
-		# and at the rest elements are the expressions for this operation
+	# This function goes through raw once, with an explicit
+	# stack instead of recursion, so it takes linear time and
+	# works at any nesting depth. It's the main thing that
+	# Expression does. Errors are raised in the same order as
+	# if raw was validated first and parsed afterwards: an
+	# invalid character first, then unbalanced parentheses,
+	# and then the first syntax error found while parsing.
+	def __parse(self):
+		raw = self.raw
+		# each frame is [index of its opening parenthesis,
+		# operation, expression stack] for one pair of
+		# parentheses; the first frame is raw itself
+		frames = [[-1, None, []]]
+		depth, parenthesis_error, syntax_error = 0, None, None
+		# parsed expressions built so far, by structure
+		self.__nodes = {}
+		index = -1
+		while index + 1 < len(raw):
+			index += 1
+			char = raw[index]
+			if ExpressionAsserter.is_identifier_start(char):
+				end = ExpressionAsserter.get_identifier_end(raw, index)
+				self.__add_variable_position(raw[index:end], index)
+				frames[-1][2].append(self.make_value(raw[index:end]))
+				index = end - 1
+			elif ExpressionAsserter.is_in_alphabet(char):
+				self.__add_variable_position(char, index)
+				frames[-1][2].append(self.make_value(char))
+			elif ExpressionAsserter.is_operator(char):
+				# there should be only one operation per scope
+				try:
+					frames[-1][1] = Expression.__get_operation(frames[-1][1], char)
+				except SyntaxError as error:
+					syntax_error = syntax_error or error
+			elif ExpressionAsserter.is_opening_parenthesis(char):
+				depth += 1
+				frames.append([index, None, []])
+			elif ExpressionAsserter.is_closing_parenthesis(char):
+				depth -= 1
+				if depth < 0:
+					parenthesis_error = parenthesis_error or AssertionError("parenthesis count was negative. It should never be.")
+					frames = [[-1, None, []]]
+					continue
+				opening_index, operation, expression_stack = frames.pop()
+				try:
+					Expression.__assert_parsed_is_valid(operation, expression_stack, raw, opening_index + 1, index)
+					frames[-1][2].append(self.make_parsed(operation, expression_stack))
+				except (AssertionError, SyntaxError) as error:
+					syntax_error = syntax_error or error
+			else:
+				assert ExpressionAsserter.is_blank_space(char), "one of the characters in the raw string was invalid. Received: " + str(char)
+		if parenthesis_error is not None:
+			raise parenthesis_error
+		assert depth == 0, "Parentheses do not match"
+		if syntax_error is not None:
+			raise syntax_error
+		_, operation, expression_stack = frames[0]
+		Expression.__assert_parsed_is_valid(operation, expression_stack, raw, 0, len(raw))
+		self.parsed = self.make_parsed(operation, expression_stack)
+		del self.__nodes
+
+	# This method is called by the parser for every Value
+	# found in raw (a letter or an identifier), and returns
+	# what goes in the expression stack for it: the Value
+	# itself. Subclasses storing
+	# Expressions differently (see CompactExpression.py)
+	# override it along with make_parsed.
+	def make_value(self, char):
+		return char
+
+	# This method is called by the parser for every valid
+	# operation and its expression stack. It returns an array
+	# containing at the first index the operation and at the
+	# rest elements the expressions for this operation.
+	#
+	# If a parsed Expression with the same structure was
+	# already built, that one is returned instead, so that
+	# identical Expressions appearing many times in raw are
+	# one shared list: "(A*B)+C+(B*A)" gives [43, X, 'C', X]
+	# where X is one list [42, 'A', 'B']. Operands of
+	# commutative operations are compared regardless of their
+	# order. Code walking parsed Expressions can then handle
+	# each shared one only once (see get_postorder_nodes).
+	def make_parsed(self, operation, expression_stack):
+		# children are already shared, so their id is their structure
+		keys = [("V", expr) if type(expr) != list else ("E", id(expr)) for expr in expression_stack]
+		if AdvancedOperation.is_commutative(operation):
+			keys.sort()
 		result = [operation]
 		result.extend(expression_stack)
-		return result
+		return self.__nodes.setdefault((operation, tuple(keys)), result)
+
+	@staticmethod
+	def __assert_parsed_is_valid(operation, expression_stack, raw, start, end):
+		# make sure this operation follows the guidelines as stated
+		# above. The substring is only made to be shown in errors
+		if not Expression.__is_operation_valid(operation, expression_stack):
+			Expression.__assert_operation_is_valid(operation, expression_stack, raw[start:end])
+
+	@staticmethod
+	def __is_operation_valid(operation, expression_stack):
+		if operation == None:
+			return False
+		if operation == ord("!"):
+			return len(expression_stack) < 2
+		if (operation == ord("*")) or (operation == ord("+")):
+			return len(expression_stack) > 1
+		return True
 
 	@staticmethod
 	def __get_operation(operation, char, raw=None):
@@ -204,6 +260,64 @@ class Expression:
 
 		return current_index
 
+	# this method returns the list Expressions of a parsed Expression in
+	# post-order (children before their parent), each one only once even
+	# when it is shared. It walks with an explicit stack so that deeply
+	# nested Expressions do not hit the recursion limit
+	@staticmethod
+	def get_postorder_nodes(parsed):
+		nodes, seen, stack = [], set(), [(parsed, False)]
+		while stack:
+			node, expanded = stack.pop()
+			if expanded:
+				nodes.append(node)
+				continue
+			if id(node) in seen:
+				continue
+			seen.add(id(node))
+			stack.append((node, True))
+			# reversed so that the children are visited from left to right
+			for child in reversed(node[1:]):
+				if type(child) == list and id(child) not in seen:
+					stack.append((child, False))
+		return nodes
+
+	# this method returns the given names of Values in their natural
+	# order: alphabetical, except that numbers in them are compared
+	# as numbers, so that x2 comes before x10 and in[9] before in[10]
+	@staticmethod
+	def sort_variables(names):
+		return sorted(names, key=Expression.get_sort_key)
+
+	@staticmethod
+	def get_sort_key(name):
+		parts, index = [], 0
+		while index < len(name):
+			end, is_number = index, ExpressionAsserter.is_digit(name[index])
+			while end < len(name) and ExpressionAsserter.is_digit(name[end]) == is_number:
+				end += 1
+			parts.append((1, int(name[index:end]), "") if is_number else (0, 0, name[index:end]))
+			index = end
+		# names like x1 and x01 still come in a fixed order
+		return (parts, name)
+
+	# this method returns a raw string parsing into the given parsed
+	# Expression. A Value on its own is ORed with itself, since a raw
+	# needs an operation. Shared Expressions are written once and
+	# repeated, and nesting does not hit the recursion limit
+	@staticmethod
+	def to_raw(parsed):
+		if type(parsed) != list:
+			return parsed + AdvancedOperation.SYMBOLS["OR"] + parsed
+		raws = {}
+		for node in Expression.get_postorder_nodes(parsed):
+			operands = [child if type(child) != list else "(" + raws[id(child)] + ")" for child in node[1:]]
+			if len(operands) == 1:
+				raws[id(node)] = chr(node[0]) + operands[0]
+			else:
+				raws[id(node)] = chr(node[0]).join(operands)
+		return raws[id(parsed)]
+
 	def __str__(self):
 		return str(self.raw)
 
@@ -1,4 +1,4 @@
-from BasicOperation import AdvancedOperation
+from lib.BasicOperation import AdvancedOperation
 
 
 class ExpressionAsserter:
@@ -16,11 +16,14 @@ class ExpressionAsserter:
 	def get_operators():
 		# symbols for operators
 		# ! means NOT, $ means NOR,  & means NAND, * means AND, + means OR, > means IMPLIES, ^ means XOR, | means IFF
-		return {"!": 33, "$": 36, "&": 38, "*": 42, "+": 43, ">": 62, "^": 94, "|": 124}
+		# this is the registry of AdvancedOperation itself, so
+		# operators registered later on are in it too
+		return AdvancedOperation.SYMBOL_CODES
 
 	@staticmethod
 	def get_alphabet():
-		# uppercase alphabet
+		# uppercase alphabet, for single letter Values; see
+		# is_identifier_start for longer ones
 		return {chr(i): i for i in range(65, 91)}
 
 	OPERATORS = get_operators.__func__()
@@ -28,7 +31,6 @@ class ExpressionAsserter:
 
 	@staticmethod
 	def assert_raw_is_valid(raw):
-		RANGE = range(0, len(raw))
 		# checks that the string parameter given is valid
 		assert type(raw) == str, "raw must be a string"
 
@@ -36,12 +38,22 @@ class ExpressionAsserter:
 		def character_error_for_character(char):
 			return "one of the characters in the raw string was invalid. Received: " + str(char)
 
-		for i in RANGE:
+		# characters and parentheses are checked in the same pass;
+		# an invalid character is reported before a parenthesis error
+		count, is_count_negative, i = 0, False, 0
+		while i < len(raw):
 			char = raw[i]
+			if ExpressionAsserter.is_identifier_start(char):
+				i = ExpressionAsserter.get_identifier_end(raw, i)
+				continue
 			assert ExpressionAsserter.is_valid_raw_character(char), character_error_for_character(char)
+			count = count + ExpressionAsserter.get_delta_character_for_parenthesis(char)
+			is_count_negative = is_count_negative or count < 0
+			i += 1
 
 		# assert the parenthesis count
-		ExpressionAsserter.assert_parentheses_count(raw)
+		assert not is_count_negative, "parenthesis count was negative. It should never be."
+		assert count == 0, "Parentheses do not match"
 
 	@staticmethod
 	def is_valid_raw_character(char):
@@ -56,6 +68,35 @@ class ExpressionAsserter:
 	def is_in_alphabet(char):
 		return ExpressionAsserter.ALPHABET.get(char, -1) != -1
 
+	# Values are either a single uppercase letter or an identifier:
+	# a lowercase letter or _, then letters, digits and _, then
+	# optionally an index in brackets, such as x17, clk_en or in[42]
+	@staticmethod
+	def is_identifier_start(char):
+		return char == "_" or ("a" <= char <= "z")
+
+	@staticmethod
+	def is_identifier_character(char):
+		return char == "_" or ("a" <= char <= "z") or ("A" <= char <= "Z") or ExpressionAsserter.is_digit(char)
+
+	@staticmethod
+	def is_digit(char):
+		return "0" <= char <= "9"
+
+	@staticmethod
+	def get_identifier_end(raw, index):
+		# returns the index right after the identifier starting at index
+		end = index + 1
+		while end < len(raw) and ExpressionAsserter.is_identifier_character(raw[end]):
+			end += 1
+		if end < len(raw) and raw[end] == "[":
+			closing = end + 1
+			while closing < len(raw) and ExpressionAsserter.is_digit(raw[closing]):
+				closing += 1
+			if closing > end + 1 and closing < len(raw) and raw[closing] == "]":
+				end = closing + 1
+		return end
+
 	@staticmethod
 	def is_operator(char):
 		return ExpressionAsserter.OPERATORS.get(char, -1) != -1
@@ -0,0 +1,140 @@
+import threading
+from collections import OrderedDict
+
+from lib.Expression import Expression
+from lib.ExpressionAsserter import ExpressionAsserter
+from lib.CompactExpression import CompactExpression
+from lib.CompiledExpression import CompiledExpression
+from lib.Instrumentation import Instrumentation
+
+
+class ExpressionCache:
+	"""
+	A bounded, thread-safe cache of parsed and compiled
+	expressions (see Expression.py and CompiledExpression.py)
+	keyed by their normalized raw, so that building the same
+	expression again, or comparing a DigitalInputer to a raw
+	string, does not parse and compile it every time.
+
+	When the cache holds maxsize expressions, the least
+	recently used one is dropped. A maxsize of 0 turns the
+	cache off.
+
+	Raws are normalized by removing their blank spaces, which
+	the parser ignores: "A + B" and "A+B" share one entry (the
+	Expression parsed from whichever came first). Compact
+	expressions (see CompactExpression.py) have entries of
+	their own.
+	"""
+
+	def __init__(self, maxsize=128):
+		assert type(maxsize) == int and maxsize >= 0, "maxsize must be a non negative integer"
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self.__entries = OrderedDict()
+		self.__lock = threading.Lock()
+
+	@staticmethod
+	def normalize(raw):
+		"""
+		Returns raw without its blank spaces, except the ones
+		separating two identifiers (see ExpressionAsserter.py),
+		such as "x y", which would become one otherwise
+		"""
+		if " " not in raw:
+			return raw
+		characters, is_separating = [], False
+		for char in raw:
+			if char == " ":
+				is_separating = len(characters) > 0 and ExpressionAsserter.is_identifier_character(characters[-1])
+				continue
+			if is_separating and (ExpressionAsserter.is_identifier_character(char) or char == "["):
+				characters.append(" ")
+			is_separating = False
+			characters.append(char)
+		return "".join(characters)
+
+	def get(self, raw, compact=False):
+		"""
+		Returns the pair (Expression, CompiledExpression)
+		of raw, building it if it is not in the cache. If
+		compact is True, the Expression is a CompactExpression.
+		"""
+		if type(raw) != str:
+			# let Expression raise its usual error
+			return ExpressionCache.__build(raw, compact)
+		key = (ExpressionCache.normalize(raw), compact)
+		with self.__lock:
+			entry = self.__entries.get(key)
+			if entry is not None:
+				self.hits += 1
+				self.__entries.move_to_end(key)
+				return entry
+			self.misses += 1
+		# built outside of the lock, so other threads do not wait
+		entry = ExpressionCache.__build(raw, compact)
+		with self.__lock:
+			if self.maxsize > 0:
+				self.__entries[key] = entry
+				self.__evict()
+		return entry
+
+	@staticmethod
+	def __build(raw, compact):
+		if Instrumentation.ENABLED:
+			return ExpressionCache.__build_instrumented(raw, compact)
+		expression = CompactExpression(raw) if compact else Expression(raw)
+		return expression, CompiledExpression(expression)
+
+	@staticmethod
+	def __build_instrumented(raw, compact):
+		start = Instrumentation.CLOCK()
+		expression = CompactExpression(raw) if compact else Expression(raw)
+		parsed = Instrumentation.CLOCK()
+		compiled = CompiledExpression(expression)
+		Instrumentation.record("parse", parsed - start)
+		Instrumentation.record("compile", Instrumentation.CLOCK() - parsed)
+		return expression, compiled
+
+	def set_maxsize(self, maxsize):
+		"""
+		Changes the number of expressions the cache can hold,
+		dropping the least recently used ones if needed
+		"""
+		assert type(maxsize) == int and maxsize >= 0, "maxsize must be a non negative integer"
+		with self.__lock:
+			self.maxsize = maxsize
+			self.__evict()
+
+	def __evict(self):
+		while len(self.__entries) > self.maxsize:
+			self.__entries.popitem(last=False)
+
+	def clear(self):
+		"""
+		Drops every expression and resets the statistics
+		"""
+		with self.__lock:
+			self.__entries.clear()
+			self.hits = 0
+			self.misses = 0
+
+	def get_stats(self):
+		"""
+		Returns a dictionary with the number of hits and
+		misses, the hit rate, and the current and maximum
+		number of expressions held
+		"""
+		with self.__lock:
+			lookups = self.hits + self.misses
+			return {
+				"hits": self.hits,
+				"misses": self.misses,
+				"hitRate": self.hits / lookups if lookups > 0 else 0.0,
+				"size": len(self.__entries),
+				"maxsize": self.maxsize,
+			}
+
+	def __len__(self):
+		return len(self.__entries)
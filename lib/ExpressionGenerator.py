@@ -0,0 +1,75 @@
+import random
+
+from lib.BasicOperation import AdvancedOperation
+
+
+class ExpressionGenerator:
+	"""
+	Generates random raw expressions (see Expression.py), the
+	same ones for the same seed and parameters, so that
+	benchmarks (see benchmark.py) can be run again on other
+	versions of the code and compared.
+
+	- varCount: the number of variables to pick Values from:
+		letters A to Z up to 26 of them, identifiers x0, x1...
+		(see ExpressionAsserter.py) otherwise. An expression
+		does not always use all of them.
+	- depth: the maximum nesting of operations
+	- fanIn: the maximum number of operands of an operation;
+		operations taking any number of operands get 2 to fanIn
+		of them, the others get as many as they take
+	- operators: the symbols of the operators to use, or a
+		dictionary mapping them to weights; every registered
+		operator by default
+	- leafProbability: the probability that an operand below
+		the top operation is a Value rather than an operation
+	"""
+
+	def __init__(self, seed=0, varCount=8, depth=6, fanIn=3, operators=None, leafProbability=0.3):
+		assert varCount > 0, "varCount must be positive"
+		assert depth > 0, "depth must be positive"
+		assert fanIn > 1, "fanIn must be at least 2"
+		if operators is None:
+			operators = list(AdvancedOperation.SYMBOL_CODES.keys())
+		if not isinstance(operators, dict):
+			operators = {symbol: 1 for symbol in operators}
+		for symbol in operators:
+			assert symbol in AdvancedOperation.SYMBOL_CODES, "Unknown operator: " + str(symbol)
+		self.random = random.Random(seed)
+		self.varCount = varCount
+		self.depth = depth
+		self.fanIn = fanIn
+		self.leafProbability = leafProbability
+		self.symbols = sorted(operators.keys())
+		self.weights = [operators[symbol] for symbol in self.symbols]
+		if varCount <= 26:
+			self.variables = [chr(65 + index) for index in range(varCount)]
+		else:
+			self.variables = ["x" + str(index) for index in range(varCount)]
+
+	def generate(self):
+		"""
+		Returns a new random raw expression. The expression is
+		built with an explicit stack, so any depth works.
+		"""
+		# every frame is [symbol, number of operands, operands so far]
+		frames = [self.__new_frame()]
+		while True:
+			symbol, count, operands = frames[-1]
+			if len(operands) == count:
+				frames.pop()
+				raw = symbol + operands[0] if count == 1 else symbol.join(operands)
+				if len(frames) == 0:
+					return raw
+				frames[-1][2].append("(" + raw + ")")
+			elif len(frames) >= self.depth or self.random.random() < self.leafProbability:
+				operands.append(self.random.choice(self.variables))
+			else:
+				frames.append(self.__new_frame())
+
+	def __new_frame(self):
+		symbol = self.random.choices(self.symbols, self.weights)[0]
+		operator = AdvancedOperation.get_operator(AdvancedOperation.SYMBOL_CODES[symbol])
+		maximum = self.fanIn if operator.maximum is None else operator.maximum
+		count = self.random.randint(operator.minimum, max(operator.minimum, maximum))
+		return [symbol, count, []]
@@ -0,0 +1,235 @@
+import time
+import weakref
+import threading
+from collections import OrderedDict
+
+from lib.Expression import Expression
+from lib.BasicOperation import AdvancedOperation
+
+
+class Instrumentation:
+	"""
+	Opt-in counters and timings of the hot paths, off by
+	default. While it is off, the instrumented code only
+	checks Instrumentation.ENABLED, so it costs next to
+	nothing.
+
+	Once enable() is called, it records:
+	- the time spent, and the number of calls, in every one
+		of the PHASES:
+		- "parse": parsing a raw expression, which checks it
+			with ExpressionAsserter as it goes (cache misses
+			only, see ExpressionCache.py)
+		- "compile": compiling it (see CompiledExpression.py)
+		- "validate": checking inputs with InputAsserter
+		- "evaluate": computing outputs (get_output and
+			get_outputs of DigitalInputer)
+		- "table": computing truth tables (see TruthTable.py)
+	- the number of evaluations of every operator: one per
+		row and per operation using it. Lazy evaluations (see
+		LazyEvaluator.py) stop early, so only their time is
+		recorded.
+	- the number of rows each of the last MAX_EXPRESSIONS
+		expressions evaluated was evaluated on. Expressions
+		are only referenced weakly, so this does not keep them
+		alive once ExpressionCache.py drops them.
+	- with enable(profile=True), the time spent in every node
+		of get_output, through a slower instrumented function
+		(see CompiledExpression.get_profiled_function).
+		get_hot_nodes() then returns the subexpressions costing
+		the most.
+
+	get_stats() returns all of it as a dictionary, along with
+	the statistics of an ExpressionCache if given one (see
+	DigitalInputer.get_stats), for a metrics exporter to poll.
+	Hooks added with add_hook(hook) are instead called as
+	hook(phase, seconds, rows) every time a phase is recorded.
+	"""
+
+	PHASES = ("parse", "compile", "validate", "evaluate", "table")
+	ENABLED = False
+	PROFILING = False
+	CLOCK = time.perf_counter
+	HOOKS = []
+	MAX_EXPRESSIONS = 128
+
+	__lock = threading.Lock()
+	__timings = {phase: 0.0 for phase in PHASES}
+	__calls = {phase: 0 for phase in PHASES}
+	__operators = {}
+	# [weak reference to the compiled expression, rows, times
+	# by instruction or None, operations by operator name] by
+	# raw, the least recently used first
+	__nodes = OrderedDict()
+
+	@staticmethod
+	def enable(profile=False):
+		"""
+		Starts recording; with profile=True, get_output also
+		times every node of the expression
+		"""
+		Instrumentation.PROFILING = profile
+		Instrumentation.ENABLED = True
+
+	@staticmethod
+	def disable():
+		"""
+		Stops recording, keeping what was recorded so far
+		"""
+		Instrumentation.ENABLED = False
+		Instrumentation.PROFILING = False
+
+	@staticmethod
+	def reset():
+		"""
+		Drops everything recorded so far
+		"""
+		with Instrumentation.__lock:
+			for phase in Instrumentation.PHASES:
+				Instrumentation.__timings[phase] = 0.0
+				Instrumentation.__calls[phase] = 0
+			Instrumentation.__operators.clear()
+			Instrumentation.__nodes.clear()
+
+	@staticmethod
+	def add_hook(hook):
+		"""
+		Adds a function called as hook(phase, seconds, rows)
+		every time a phase is recorded, rows being 0 for the
+		phases that do not evaluate anything
+		"""
+		assert callable(hook), "hook must be callable"
+		Instrumentation.HOOKS.append(hook)
+
+	@staticmethod
+	def remove_hook(hook):
+		Instrumentation.HOOKS.remove(hook)
+
+	@staticmethod
+	def record(phase, seconds, rows=0):
+		"""
+		Adds one call of the given phase, which took the given
+		number of seconds, and calls the hooks
+		"""
+		with Instrumentation.__lock:
+			Instrumentation.__timings[phase] += seconds
+			Instrumentation.__calls[phase] += 1
+		for hook in list(Instrumentation.HOOKS):
+			hook(phase, seconds, rows)
+
+	@staticmethod
+	def count_rows(raw, compiled, rows):
+		"""
+		Adds the given number of rows to the ones the
+		expression, and every operator in it, was evaluated on
+		"""
+		with Instrumentation.__lock:
+			entry = Instrumentation.__get_node_entry(raw, compiled)
+			entry[1] += rows
+			operators = Instrumentation.__operators
+			for name, count in entry[3].items():
+				operators[name] = operators.get(name, 0) + count * rows
+
+	@staticmethod
+	def get_profile_times(raw, compiled):
+		"""
+		Returns the list, by instruction, of the time spent
+		in every node of the expression, for the function of
+		CompiledExpression.get_profiled_function to add to
+		"""
+		with Instrumentation.__lock:
+			entry = Instrumentation.__get_node_entry(raw, compiled)
+			if entry[2] is None:
+				entry[2] = [0.0] * len(compiled.instructions)
+			return entry[2]
+
+	@staticmethod
+	def __get_node_entry(raw, compiled):
+		nodes = Instrumentation.__nodes
+		entry = nodes.get(raw)
+		if entry is None or entry[0]() is not compiled:
+			operations = {}
+			for operation, _ in compiled.instructions:
+				name = Instrumentation.__get_operator_name(operation)
+				operations[name] = operations.get(name, 0) + 1
+			entry = [weakref.ref(compiled), 0, None, operations]
+			nodes[raw] = entry
+			while len(nodes) > Instrumentation.MAX_EXPRESSIONS:
+				nodes.popitem(last=False)
+		nodes.move_to_end(raw)
+		return entry
+
+	@staticmethod
+	def get_stats(cache=None):
+		"""
+		Returns a snapshot of what was recorded: a dictionary
+		with the seconds and calls of every phase, the number
+		of evaluations of every operator by name, the number
+		of rows of the last expressions by raw and, given an
+		ExpressionCache, its statistics
+		"""
+		with Instrumentation.__lock:
+			stats = {
+				"enabled": Instrumentation.ENABLED,
+				"profiling": Instrumentation.PROFILING,
+				"seconds": dict(Instrumentation.__timings),
+				"calls": dict(Instrumentation.__calls),
+				"operators": dict(Instrumentation.__operators),
+				"rows": {raw: entry[1] for raw, entry in Instrumentation.__nodes.items()},
+			}
+		if cache is not None:
+			stats["cache"] = cache.get_stats()
+		return stats
+
+	@staticmethod
+	def get_hot_nodes(raw, count=10):
+		"""
+		Returns up to count nodes of the expression profiled
+		for raw (see enable), as dictionaries with their
+		subexpression ("raw"), operator name and seconds, the
+		most costly first. Nothing is returned for expressions
+		that were not profiled.
+		"""
+		with Instrumentation.__lock:
+			entry = Instrumentation.__nodes.get(raw)
+			if entry is None or entry[2] is None:
+				return []
+			compiled, times = entry[0](), list(entry[2])
+		if compiled is None:
+			return []
+		indices = sorted(range(len(times)), key=lambda index: -times[index])
+		return [{
+			"raw": Instrumentation.get_node_raw(compiled, compiled.varCount + index),
+			"operator": Instrumentation.__get_operator_name(compiled.instructions[index][0]),
+			"seconds": times[index],
+		} for index in indices[:count]]
+
+	@staticmethod
+	def get_node_raw(compiled, slot):
+		"""
+		Returns the raw subexpression computed in the given
+		slot of a CompiledExpression
+		"""
+		count = compiled.varCount
+		nodes = {}
+		pending = [slot]
+		while len(pending) > 0:
+			current = pending[-1]
+			if current < count or current in nodes:
+				pending.pop()
+				continue
+			operation, operands = compiled.instructions[current - count]
+			missing = [operand for operand in operands if operand >= count and operand not in nodes]
+			if len(missing) > 0:
+				pending.extend(missing)
+				continue
+			pending.pop()
+			nodes[current] = [operation] + [nodes[operand] if operand >= count else compiled.varsSorted[operand] for operand in operands]
+		if slot < count:
+			return compiled.varsSorted[slot]
+		return Expression.to_raw(nodes[slot])
+
+	@staticmethod
+	def __get_operator_name(operation):
+		operator = AdvancedOperation.OPERATORS.get(operation)
+		return operator.name if operator is not None else chr(operation)
@@ -0,0 +1,197 @@
+from lib.BasicOperation import AdvancedOperation
+from lib.CompiledExpression import CompiledExpression
+
+
+class LazyEvaluator:
+	"""
+	Evaluates a compiled expression (see CompiledExpression.py)
+	on one input at a time, skipping what the output does not
+	depend on: AND, OR, NAND and NOR stop at their first
+	operand holding their controlling value (0 for AND and
+	NAND, 1 for OR and NOR; see Operator in BasicOperation.py),
+	like Python's "and" and "or" do.
+
+	Operands are tried from the most to the least promising
+	one: the ones that cost less to compute (their number of
+	operations) and that are more likely to hold the
+	controlling value come first. That likelihood is 1/2
+	until inputs are observed with observe() (or, with
+	adaptive=True, every OBSERVE_PERIOD evaluations);
+	reorder() then takes the observations into account, which
+	adaptive=True does every REORDER_PERIOD evaluations.
+
+	Like CompiledExpression, this generates a Python function,
+	made of nested "and"/"or" expressions. Two kinds of
+	operations are computed ahead, whether they end up needed
+	or not: the ones used by several others, so they are
+	computed once, and one in every MAX_HEIGHT levels of
+	nesting, so the generated code stays shallow enough for
+	Python to compile.
+
+	This only handles 0s and 1s; masks and arrays are faster
+	to evaluate with CompiledExpression.evaluate.
+	"""
+
+	CONTROLLING_NAMES = ("AND", "OR", "NAND", "NOR")
+	# operators whose code uses each operand once
+	SINGLE_USE_NAMES = ("NOT", "XOR", "IFF", "IMPLIES")
+	MAX_HEIGHT = 30
+	OBSERVE_PERIOD = 64
+	REORDER_PERIOD = 4096
+
+	def __init__(self, compiled, adaptive=False):
+		compiled.assert_operations_are_valid()
+		self.compiled = compiled
+		self.varCount = compiled.varCount
+		self.adaptive = adaptive
+		self.calls = 0
+		instructions = compiled.instructions
+		# controlling value of every instruction that can stop early
+		self.controlling = [self.__get_controlling(operation, operands) for operation, operands in instructions]
+		self.observations = [0] * len(instructions)
+		# how often every operand held the controlling value
+		self.hits = [[0] * len(operands) for _, operands in instructions]
+		self.hoisted = self.__get_hoisted()
+		self.costs = self.__get_costs()
+		self.__fill = None
+		self.reorder()
+
+	@staticmethod
+	def __get_controlling(operation, operands):
+		operator = AdvancedOperation.OPERATORS.get(operation)
+		if operator is None or operator.name not in LazyEvaluator.CONTROLLING_NAMES:
+			return None
+		if not operator.is_arity_valid(len(operands)):
+			return None
+		return operator.controlling
+
+	def __get_hoisted(self):
+		"""
+		Returns the slots of the instructions computed ahead
+		"""
+		count = self.varCount
+		uses = [0] * (count + len(self.compiled.instructions))
+		heights = [0] * len(uses)
+		hoisted = set()
+		for index, (_, operands) in enumerate(self.compiled.instructions):
+			slot = count + index
+			heights[slot] = 1 + max([0] + [heights[operand] for operand in operands])
+			if heights[slot] % LazyEvaluator.MAX_HEIGHT == 0:
+				hoisted.add(slot)
+				heights[slot] = 0
+			for operand in operands:
+				uses[operand] += 1
+		hoisted.update([slot for slot in range(count, len(uses)) if uses[slot] > 1])
+		return hoisted
+
+	def __get_costs(self):
+		"""
+		Returns the number of operations computed when
+		evaluating every slot, inputs and slots computed
+		ahead counting as 1
+		"""
+		count = self.varCount
+		costs = [1] * (count + len(self.compiled.instructions))
+		for index, (_, operands) in enumerate(self.compiled.instructions):
+			costs[count + index] = 1 + sum([1 if operand in self.hoisted else costs[operand] for operand in operands])
+		return costs
+
+	def evaluate(self, array):
+		"""
+		Returns the output for the given inputs (0s and 1s in
+		the order of varsSorted), which must be valid
+		"""
+		if self.adaptive:
+			self.calls += 1
+			if self.calls % LazyEvaluator.OBSERVE_PERIOD == 0:
+				self.observe(array)
+			if self.calls % LazyEvaluator.REORDER_PERIOD == 0:
+				self.reorder()
+		return self.__evaluate(array)
+
+	def observe(self, array):
+		"""
+		Computes every instruction on the given inputs and
+		counts, for every operand that can stop an instruction
+		early, whether it did
+		"""
+		if self.__fill is None:
+			self.__fill = self.compiled.get_fill_function()
+		slots = list(array) + [0] * len(self.compiled.instructions)
+		self.__fill(slots)
+		for index, (_, operands) in enumerate(self.compiled.instructions):
+			controlling = self.controlling[index]
+			if controlling is None:
+				continue
+			self.observations[index] += 1
+			hits = self.hits[index]
+			for position, operand in enumerate(operands):
+				if slots[operand] == controlling:
+					hits[position] += 1
+
+	def get_order(self, index):
+		"""
+		Returns the positions of the operands of the
+		instruction at index in the order they are tried:
+		by increasing cost over the likelihood that they
+		hold the controlling value
+		"""
+		operands = self.compiled.instructions[index][1]
+		observations, hits = self.observations[index], self.hits[index]
+
+		def get_key(position):
+			likelihood = (hits[position] + 1) / (observations + 2)
+			cost = 1 if operands[position] in self.hoisted else self.costs[operands[position]]
+			return cost / likelihood
+
+		return sorted(range(len(operands)), key=get_key)
+
+	def reorder(self):
+		"""
+		Generates the function again, with the operands in
+		the order get_order gives now
+		"""
+		self.source = self.get_source()
+		self.__evaluate = CompiledExpression.get_function(self.source, "evaluate")
+
+	def get_source(self):
+		"""
+		Returns the source code of the function evaluate(IN, ONE=1)
+		"""
+		count = self.varCount
+		lines = ["def evaluate(IN, ONE=1):"]
+		if count > 0:
+			lines.append("\t" + "".join(["s" + str(slot) + ", " for slot in range(count)]) + "= IN")
+		root = count + len(self.compiled.instructions) - 1
+		for slot in sorted(self.hoisted):
+			if slot != root:
+				lines.append("\ts" + str(slot) + " = " + self.__get_code(slot))
+		lines.append("\treturn " + self.__get_code(root))
+		return "\n".join(lines) + "\n"
+
+	def __get_reference(self, slot):
+		if slot < self.varCount or slot in self.hoisted:
+			return "s" + str(slot)
+		return "(" + self.__get_code(slot) + ")"
+
+	def __get_code(self, slot):
+		# the nesting is at most MAX_HEIGHT deep, so recursing is fine
+		index = slot - self.varCount
+		operation, operands = self.compiled.instructions[index]
+		controlling = self.controlling[index]
+		if controlling is None:
+			names = [self.__get_reference(operand) for operand in operands]
+			if AdvancedOperation.OPERATORS[operation].name in LazyEvaluator.SINGLE_USE_NAMES:
+				return CompiledExpression.get_operation_code(operation, names)
+			# other operators may use an operand more than once, so
+			# their operands are computed first, as arguments
+			parameters = ["t" + str(position) for position in range(len(names))]
+			code = CompiledExpression.get_operation_code(operation, parameters)
+			return "(lambda " + ", ".join(parameters) + ": " + code + ")(" + ", ".join(names) + ")"
+		names = [self.__get_reference(operands[position]) for position in self.get_order(index)]
+		code = (" and " if controlling == 0 else " or ").join(names)
+		operator = AdvancedOperation.OPERATORS[operation]
+		if operator.controlled != controlling:
+			# NAND and NOR
+			return "(" + code + ") ^ 1"
+		return code
@@ -0,0 +1,387 @@
+import time
+
+from lib.TruthTable import TruthTable
+
+
+class Minimizer:
+	"""
+	Turns a TruthTable (see TruthTable.py) into a small sum
+	of products: an OR of ANDs of variables and NOTed
+	variables, written as a raw expression (see Expression.py).
+
+	Products are cubes, pairs of integers (mask, value): the
+	variable at index i of varsSorted is bit 1 << (n - 1 - i),
+	where n is the number of variables, and a cube holds the
+	rows whose bits in mask equal those in value. That bit is
+	also the distance between rows that only differ in that
+	variable, so the row r is the cube (all bits, r). Sets of
+	rows are integers too, bit r standing for row r, like the
+	bits of a TruthTable.
+
+	- With up to EXACT_LIMIT variables, every prime implicant
+		(a cube that cannot get bigger without covering a 0)
+		is found with the Quine-McCluskey method, and the
+		smallest set of them covering every 1 is searched for,
+		giving up after BRANCH_LIMIT steps with the best found.
+	- Otherwise, a first cover is found by splitting the table
+		on every variable (Minato-Morreale), then improved
+		Espresso-style: every cube is expanded into a prime,
+		redundant cubes are dropped, and cubes are reduced to
+		what only they cover before being expanded again, as
+		long as the number of literals goes down. After
+		TIME_LIMIT seconds, counted from the first split, what
+		is left is kept as it is: rows not split yet get one
+		cube each and cubes not improved yet stay, so big
+		tables still take seconds.
+
+	The result only holds the variables the output depends on.
+	"""
+
+	EXACT_LIMIT = 10
+	BRANCH_LIMIT = 10000
+	TIME_LIMIT = 2.0
+
+	@staticmethod
+	def minimize(table):
+		"""
+		Returns a raw sum of products giving the same outputs
+		as the TruthTable
+		"""
+		return Minimizer.get_raw(Minimizer.get_cover(table), table.varsSorted)
+
+	@staticmethod
+	def get_cover(table):
+		"""
+		Returns the cubes of a small sum of products giving
+		the same outputs as the TruthTable, in order
+		"""
+		count = table.varCount
+		on = table.get_bits()
+		full = (1 << table.rowCount) - 1
+		ones = [TruthTable.get_variable_mask(index, count) for index in range(count)]
+		masks = [(1 << (count - 1 - index), ones[index], full ^ ones[index]) for index in range(count)]
+		if on == 0:
+			return []
+		if on == full:
+			return [(0, 0)]
+		if count <= Minimizer.EXACT_LIMIT:
+			cover = Minimizer.__get_exact_cover(on, count, masks, full)
+		else:
+			cover = Minimizer.__get_heuristic_cover(on, count, masks, full)
+		# cubes testing the first variables come first
+		return sorted(cover, key=lambda cube: (-cube[0], -cube[1]))
+
+	@staticmethod
+	def get_raw(cover, variables):
+		"""
+		Returns the raw expression of the sum of the cubes
+		of cover over the given variables. A constant
+		is written with the first variable, as A*(!A) or
+		A+(!A).
+		"""
+		count = len(variables)
+		if len(cover) == 0:
+			return variables[0] + "*(!" + variables[0] + ")"
+		if (0, 0) in cover:
+			return variables[0] + "+(!" + variables[0] + ")"
+		products = []
+		for mask, value in cover:
+			product = []
+			for index, var in enumerate(variables):
+				bit = 1 << (count - 1 - index)
+				if mask & bit:
+					product.append(var if value & bit else "(!" + var + ")")
+			products.append(product)
+		if len(products) == 1:
+			product = products[0]
+			if len(product) > 1:
+				return "*".join(product)
+			# a raw needs an operation, so a single variable is ORed with itself
+			return product[0] + "+" + product[0] if product[0][0] != "(" else product[0][1:-1]
+		return "+".join([product[0] if len(product) == 1 else "(" + "*".join(product) + ")" for product in products])
+
+	@staticmethod
+	def get_cube_bits(cube, masks, full):
+		"""
+		Returns the rows of the cube
+		"""
+		mask, value = cube
+		bits = full
+		for bit, one, zero in masks:
+			if mask & bit:
+				bits &= one if value & bit else zero
+		return bits
+
+	@staticmethod
+	def __get_primes(on, count):
+		"""
+		Returns the prime implicants of the rows in on: rows
+		that only differ in one variable are merged into a
+		cube without it, then cubes of the same mask that
+		only differ in one variable, and so on
+		"""
+		values = set([row for row in range(on.bit_length()) if (on >> row) & 1])
+		current = {(1 << count) - 1: values}
+		primes = []
+		while current:
+			following = {}
+			for mask, values in current.items():
+				merged = set()
+				for value in values:
+					bits = mask & ~value
+					while bits:
+						bit = bits & -bits
+						bits ^= bit
+						if value | bit in values:
+							following.setdefault(mask ^ bit, set()).add(value)
+							merged.add(value)
+							merged.add(value | bit)
+				primes.extend([(mask, value) for value in values if value not in merged])
+			current = following
+		return primes
+
+	@staticmethod
+	def __get_exact_cover(on, count, masks, full):
+		primes = Minimizer.__get_primes(on, count)
+		rows = [Minimizer.get_cube_bits(prime, masks, full) for prime in primes]
+		# essential primes: the only ones covering one of the rows
+		chosen, remaining = [], on
+		for row in range(on.bit_length()):
+			if (on >> row) & 1:
+				covering = [index for index in range(len(primes)) if (rows[index] >> row) & 1]
+				if len(covering) == 1 and covering[0] not in chosen:
+					chosen.append(covering[0])
+					remaining &= ~rows[covering[0]]
+		candidates = [index for index in range(len(primes)) if index not in chosen and rows[index] & remaining]
+		search = _CoverSearch(primes, rows)
+		search.run(remaining, candidates, [])
+		return [primes[index] for index in chosen + search.best]
+
+	@staticmethod
+	def __get_heuristic_cover(on, count, masks, full):
+		deadline = time.perf_counter() + Minimizer.TIME_LIMIT
+		cover = Minimizer.__get_isop(on, on, count, {}, deadline)[0]
+		cover = Minimizer.__get_irredundant(Minimizer.__expand(cover, on, masks, full, deadline), masks, full, deadline)
+		while time.perf_counter() < deadline:
+			reduced = Minimizer.__reduce(cover, masks, full, deadline)
+			improved = Minimizer.__get_irredundant(Minimizer.__expand(reduced, on, masks, full, deadline), masks, full, deadline)
+			if Minimizer.get_cost(improved) >= Minimizer.get_cost(cover):
+				return cover
+			cover = improved
+		return cover
+
+	@staticmethod
+	def get_cost(cover):
+		"""
+		Returns the number of literals of cover, then its
+		number of cubes
+		"""
+		return (sum([bin(mask).count("1") for mask, _ in cover]), len(cover))
+
+	@staticmethod
+	def __get_isop(lower, upper, count, cache, deadline):
+		"""
+		Returns (cover, bits): an irredundant sum of products
+		covering at least the rows in lower and at most the
+		rows in upper, over the last count variables, and the
+		rows it covers. The first variable splits the rows in
+		halves: the cubes needing it to be 0, the ones needing
+		it to be 1, and the ones covering both halves. Past
+		the deadline, the rows in lower are covered one cube
+		per row instead.
+		"""
+		if lower == 0:
+			return [], 0
+		size = 1 << count
+		if upper == (1 << size) - 1:
+			return [(0, 0)], upper
+		if time.perf_counter() > deadline:
+			return Minimizer.__get_minterms(lower, count), lower
+		key = (lower, upper, count)
+		if key not in cache:
+			cache[key] = Minimizer.__split_isop(lower, upper, count, cache, deadline)
+		return cache[key]
+
+	@staticmethod
+	def __get_minterms(rows, count):
+		"""
+		Returns one cube per row in rows, over the last count
+		variables
+		"""
+		mask = (1 << count) - 1
+		cubes = []
+		for index, byte in enumerate(rows.to_bytes(((1 << count) + 7) // 8, "little")):
+			while byte:
+				low = byte & -byte
+				cubes.append((mask, index * 8 + low.bit_length() - 1))
+				byte ^= low
+		return cubes
+
+	@staticmethod
+	def __split_isop(lower, upper, count, cache, deadline):
+		size = 1 << count
+		half = size >> 1
+		low_mask = (1 << half) - 1
+		lower0, lower1 = lower & low_mask, lower >> half
+		upper0, upper1 = upper & low_mask, upper >> half
+		cover0, bits0 = Minimizer.__get_isop(lower0 & ~upper1, upper0, count - 1, cache, deadline)
+		cover1, bits1 = Minimizer.__get_isop(lower1 & ~upper0, upper1, count - 1, cache, deadline)
+		rest = (lower0 & ~bits0) | (lower1 & ~bits1)
+		cover2, bits2 = Minimizer.__get_isop(rest, upper0 & upper1, count - 1, cache, deadline)
+		bit = 1 << (count - 1)
+		cover = [(mask | bit, value) for mask, value in cover0]
+		cover += [(mask | bit, value | bit) for mask, value in cover1]
+		return cover + cover2, (bits0 | bits2) | ((bits1 | bits2) << half)
+
+	@staticmethod
+	def __expand(cover, on, masks, full, deadline):
+		"""
+		Drops every literal of every cube that can be dropped
+		without covering a 0, biggest cubes first. Cubes whose
+		rows the expanded ones already cover are dropped.
+		"""
+		off = full ^ on
+		expanded, covered = [], 0
+		cover = sorted(cover, key=lambda cube: bin(cube[0]).count("1"))
+		for position, cube in enumerate(cover):
+			if time.perf_counter() > deadline:
+				return expanded + cover[position:]
+			bits = Minimizer.get_cube_bits(cube, masks, full)
+			if bits & ~covered == 0:
+				continue
+			mask, value = cube
+			for bit, _, _ in masks:
+				if mask & bit:
+					# the rows with that variable flipped
+					flipped = bits >> bit if value & bit else bits << bit
+					if flipped & off == 0:
+						mask, value, bits = mask ^ bit, value & ~bit, bits | flipped
+			expanded.append((mask, value))
+			covered |= bits
+		return expanded
+
+	@staticmethod
+	def __get_irredundant(cover, masks, full, deadline):
+		"""
+		Drops, one at a time, the cubes whose rows are all
+		covered by the cubes left, smallest cubes first
+		"""
+		counter = _RowCounter()
+		for cube in cover:
+			if time.perf_counter() > deadline:
+				return cover
+			counter.add(Minimizer.get_cube_bits(cube, masks, full))
+		kept = []
+		cover = sorted(cover, key=lambda cube: -bin(cube[0]).count("1"))
+		for position, cube in enumerate(cover):
+			if time.perf_counter() > deadline:
+				return kept + cover[position:]
+			bits = Minimizer.get_cube_bits(cube, masks, full)
+			if bits & ~counter.get_shared() == 0:
+				counter.remove(bits)
+			else:
+				kept.append(cube)
+		return kept
+
+	@staticmethod
+	def __reduce(cover, masks, full, deadline):
+		"""
+		Shrinks, one at a time, every cube to the smallest
+		cube holding the rows that no other cube covers,
+		biggest cubes first
+		"""
+		counter = _RowCounter()
+		for cube in cover:
+			if time.perf_counter() > deadline:
+				return cover
+			counter.add(Minimizer.get_cube_bits(cube, masks, full))
+		reduced = []
+		cover = sorted(cover, key=lambda cube: bin(cube[0]).count("1"))
+		for position, cube in enumerate(cover):
+			if time.perf_counter() > deadline:
+				return reduced + cover[position:]
+			bits = Minimizer.get_cube_bits(cube, masks, full)
+			unique = bits & ~counter.get_shared()
+			if unique == 0:
+				counter.remove(bits)
+				continue
+			mask, value = cube
+			for bit, one, zero in masks:
+				if not mask & bit:
+					if unique & zero == 0:
+						mask, value = mask | bit, value | bit
+					elif unique & one == 0:
+						mask = mask | bit
+			smaller = Minimizer.get_cube_bits((mask, value), masks, full)
+			counter.remove(bits ^ smaller)
+			reduced.append((mask, value))
+		return reduced
+
+
+class _RowCounter:
+	"""
+	Counts how many cubes cover every row, as the binary
+	digits of those counts: planes[i] holds the rows whose
+	count has its bit i set
+	"""
+
+	def __init__(self):
+		self.planes = []
+
+	def add(self, rows):
+		carry = rows
+		for index in range(len(self.planes)):
+			if carry == 0:
+				return
+			self.planes[index], carry = self.planes[index] ^ carry, self.planes[index] & carry
+		if carry:
+			self.planes.append(carry)
+
+	def remove(self, rows):
+		# every row removed must have been added
+		borrow = rows
+		for index in range(len(self.planes)):
+			if borrow == 0:
+				return
+			self.planes[index], borrow = self.planes[index] ^ borrow, borrow & ~self.planes[index]
+
+	def get_shared(self):
+		"""
+		Returns the rows covered by at least 2 cubes
+		"""
+		shared = 0
+		for plane in self.planes[1:]:
+			shared |= plane
+		return shared
+
+
+class _CoverSearch:
+	"""
+	Branch and bound search for the fewest primes covering
+	a set of rows, then the fewest literals
+	"""
+
+	def __init__(self, primes, rows):
+		self.primes = primes
+		self.rows = rows
+		self.steps = 0
+		self.best = None
+		self.bestCost = None
+
+	def run(self, remaining, candidates, chosen):
+		if remaining == 0:
+			cost = (len(chosen), sum([bin(self.primes[index][0]).count("1") for index in chosen]))
+			if self.best is None or cost < self.bestCost:
+				self.best, self.bestCost = list(chosen), cost
+			return
+		if self.best is not None and (len(chosen) + 1 > self.bestCost[0] or self.steps >= Minimizer.BRANCH_LIMIT):
+			return
+		self.steps += 1
+		# branch on the lowest row left, trying the primes covering most first
+		row = remaining & -remaining
+		covering = [index for index in candidates if self.rows[index] & row]
+		covering.sort(key=lambda index: -bin(self.rows[index] & remaining).count("1"))
+		for index in covering:
+			chosen.append(index)
+			self.run(remaining & ~self.rows[index], [other for other in candidates if other != index], chosen)
+			chosen.pop()
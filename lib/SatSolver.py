@@ -0,0 +1,292 @@
+import heapq
+
+
+class SatSolver:
+	"""
+	Decides whether a formula in conjunctive normal form (see
+	CnfEncoder.py) can be satisfied, with conflict-driven clause
+	learning (CDCL): values are given to variables one at a
+	time, the values forced by those choices are propagated
+	through the clauses and, when a clause cannot be satisfied
+	anymore, the choices that led to it are turned into a new
+	(learnt) clause so the same dead end is never explored
+	twice. The search then jumps back to the latest choice that
+	the learnt clause involves.
+
+	- Propagation uses two watched literals per clause: a clause
+		is only looked at when one of its two watched literals
+		becomes false, instead of after every assignment. The
+		literal a clause forces is always its first one.
+	- Choices go to the variable with the highest activity:
+		variables get more active every time they take part in
+		a conflict, and older conflicts count less and less.
+	- The search restarts from scratch, keeping its learnt
+		clauses and activities, after a number of conflicts
+		following the Luby sequence (1, 1, 2, 1, 1, 2, 4, ...)
+		times RESTART_CONFLICTS, so it does not stay stuck
+		in a bad part of the search.
+	- On restarts, once there are more than maxLearnts
+		learnt clauses, the worse half of them is dropped.
+		Clauses are ranked by the number of decision levels
+		their literals came from when they were learnt (their
+		LBD); clauses from GLUE_LBD levels or less are kept.
+
+	Values of variables: 1 for true, -1 for false and 0 for
+	not assigned yet.
+	"""
+
+	DECAY = 0.95
+	RESTART_CONFLICTS = 100
+	MAX_LEARNTS = 2000
+	MAX_LEARNTS_GROWTH = 1.1
+	GLUE_LBD = 2
+
+	def __init__(self, clauses, varCount):
+		self.varCount = varCount
+		self.values = [0] * (varCount + 1)
+		self.levels = [0] * (varCount + 1)
+		self.reasons = [None] * (varCount + 1)
+		self.phases = [-1] * (varCount + 1)
+		self.activities = [0.0] * (varCount + 1)
+		self.increment = 1.0
+		self.heap = [(0.0, variable) for variable in range(1, varCount + 1)]
+		self.watches = {}
+		self.trail = []
+		self.levelStarts = []
+		self.head = 0
+		self.units = []
+		self.clauses = []
+		# pairs (LBD, clause) of the learnt clauses
+		self.learnts = []
+		self.maxLearnts = SatSolver.MAX_LEARNTS
+		self.restarts = 0
+		self.isContradiction = False
+		for clause in clauses:
+			self.add_clause(clause)
+
+	def add_clause(self, clause):
+		"""
+		Adds a clause (a list of literals) to the formula
+		"""
+		clause = list(dict.fromkeys(clause))
+		if any(-literal in clause for literal in clause):
+			# always true
+			return
+		if len(clause) == 0:
+			self.isContradiction = True
+		elif len(clause) == 1:
+			self.units.append(clause[0])
+		else:
+			self.clauses.append(clause)
+			self.__watch(clause)
+
+	def solve(self):
+		"""
+		Returns a satisfying assignment as a list of 0s and
+		1s indexed by variable (index 0 is unused), or None
+		if the formula cannot be satisfied
+		"""
+		if self.isContradiction or not self.__assign_units():
+			return None
+		conflicts = 0
+		while True:
+			conflict = self.__propagate()
+			if conflict is not None:
+				if len(self.levelStarts) == 0:
+					return None
+				conflicts += 1
+				learnt, level = self.__analyze(conflict)
+				self.__undo(level)
+				if len(learnt) == 1:
+					self.__assign(learnt[0], None)
+				else:
+					self.__watch(learnt)
+					self.learnts.append((self.__get_lbd(learnt), learnt))
+					self.__assign(learnt[0], learnt)
+				self.increment /= SatSolver.DECAY
+				continue
+			if conflicts >= SatSolver.get_luby(self.restarts) * SatSolver.RESTART_CONFLICTS:
+				self.__restart()
+				conflicts = 0
+				continue
+			variable = self.__pick_variable()
+			if variable is None:
+				return [1 if value == 1 else 0 for value in self.values]
+			self.levelStarts.append(len(self.trail))
+			self.__assign(variable * self.phases[variable], None)
+
+	@staticmethod
+	def get_luby(index):
+		"""
+		Returns the term at index (from 0) of the Luby sequence
+		1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+		"""
+		# find the complete subsequence holding index
+		size, power = 1, 0
+		while size < index + 1:
+			power += 1
+			size = 2 * size + 1
+		while size - 1 != index:
+			size = (size - 1) >> 1
+			power -= 1
+			index = index % size
+		return 2 ** power
+
+	def __restart(self):
+		"""
+		Unassigns every choice, then drops learnt clauses if
+		there are too many. Nothing is a reason for an
+		assignment anymore at that point, so any learnt
+		clause can go.
+		"""
+		self.__undo(0)
+		self.restarts += 1
+		if len(self.learnts) > self.maxLearnts:
+			self.__reduce_learnts()
+
+	def __reduce_learnts(self):
+		self.learnts.sort(key=lambda learnt: (learnt[0], len(learnt[1])))
+		half = len(self.learnts) // 2
+		self.learnts = [learnt for position, learnt in enumerate(self.learnts) if position < half or learnt[0] <= SatSolver.GLUE_LBD]
+		self.maxLearnts = int(self.maxLearnts * SatSolver.MAX_LEARNTS_GROWTH)
+		# watch the remaining clauses again, on the same literals
+		self.watches = {}
+		for clause in self.clauses:
+			self.__watch(clause)
+		for _, clause in self.learnts:
+			self.__watch(clause)
+
+	def __get_lbd(self, clause):
+		return len(set([self.levels[abs(literal)] for literal in clause]))
+
+	def __assign_units(self):
+		for literal in self.units:
+			value = self.__get_value(literal)
+			if value == -1:
+				return False
+			if value == 0:
+				self.__assign(literal, None)
+		return True
+
+	def __watch(self, clause):
+		self.watches.setdefault(clause[0], []).append(clause)
+		self.watches.setdefault(clause[1], []).append(clause)
+
+	def __pick_variable(self):
+		while self.heap:
+			_, variable = heapq.heappop(self.heap)
+			if self.values[variable] == 0:
+				return variable
+		return None
+
+	def __bump(self, variable):
+		self.activities[variable] += self.increment
+		if self.activities[variable] > 1e100:
+			# rescale everything before it overflows
+			self.activities = [activity * 1e-100 for activity in self.activities]
+			self.increment *= 1e-100
+			self.heap = [(-self.activities[var], var) for var in range(1, self.varCount + 1) if self.values[var] == 0]
+			heapq.heapify(self.heap)
+		if self.values[variable] == 0:
+			heapq.heappush(self.heap, (-self.activities[variable], variable))
+
+	def __get_value(self, literal):
+		value = self.values[abs(literal)]
+		return value if literal > 0 else -value
+
+	def __assign(self, literal, reason):
+		variable = abs(literal)
+		self.values[variable] = 1 if literal > 0 else -1
+		self.levels[variable] = len(self.levelStarts)
+		self.reasons[variable] = reason
+		self.trail.append(literal)
+
+	def __undo(self, level):
+		"""
+		Unassigns every variable assigned after the given
+		decision level
+		"""
+		if level >= len(self.levelStarts):
+			return
+		position = self.levelStarts[level]
+		for literal in self.trail[position:]:
+			variable = abs(literal)
+			self.phases[variable] = 1 if literal > 0 else -1
+			self.values[variable] = 0
+			self.reasons[variable] = None
+			heapq.heappush(self.heap, (-self.activities[variable], variable))
+		del self.trail[position:]
+		del self.levelStarts[level:]
+		self.head = position
+
+	def __analyze(self, conflict):
+		"""
+		Returns the clause learnt from the conflict (its
+		first literal being the one it forces) and the
+		level to jump back to. The clause is cut at the first
+		unique implication point: the only literal of the
+		current level left in it.
+		"""
+		level = len(self.levelStarts)
+		learnt, seen, pending = [0], set(), 0
+		clause, index = conflict, len(self.trail) - 1
+		while True:
+			# the first literal of a reason is the one being resolved
+			for literal in (clause if clause is conflict else clause[1:]):
+				variable = abs(literal)
+				if variable in seen or self.levels[variable] == 0:
+					continue
+				seen.add(variable)
+				self.__bump(variable)
+				if self.levels[variable] == level:
+					pending += 1
+				else:
+					learnt.append(literal)
+			while abs(self.trail[index]) not in seen:
+				index -= 1
+			literal = self.trail[index]
+			index -= 1
+			pending -= 1
+			if pending == 0:
+				break
+			clause = self.reasons[abs(literal)]
+		learnt[0] = -literal
+		if len(learnt) == 1:
+			return learnt, 0
+		# the second watched literal is the latest one assigned
+		latest = max(range(1, len(learnt)), key=lambda position: self.levels[abs(learnt[position])])
+		learnt[1], learnt[latest] = learnt[latest], learnt[1]
+		return learnt, self.levels[abs(learnt[1])]
+
+	def __propagate(self):
+		"""
+		Assigns every literal forced by the trail. Returns
+		a clause that cannot be satisfied, or None
+		"""
+		while self.head < len(self.trail):
+			false_literal = -self.trail[self.head]
+			self.head += 1
+			watchers = self.watches.get(false_literal, [])
+			index = 0
+			while index < len(watchers):
+				clause = watchers[index]
+				# keep the false watched literal second
+				if clause[0] == false_literal:
+					clause[0], clause[1] = clause[1], clause[0]
+				if self.__get_value(clause[0]) == 1:
+					index += 1
+					continue
+				for other in range(2, len(clause)):
+					if self.__get_value(clause[other]) != -1:
+						# watch this literal instead
+						clause[1], clause[other] = clause[other], clause[1]
+						self.watches.setdefault(clause[1], []).append(clause)
+						watchers[index] = watchers[-1]
+						watchers.pop()
+						break
+				else:
+					if self.__get_value(clause[0]) == -1:
+						return clause
+					self.__assign(clause[0], clause)
+					index += 1
+		return None
@@ -0,0 +1,74 @@
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from lib.BasicOperation import InputAsserter
+
+
+class SpecializedInputer:
+	"""
+	What DigitalInputer.specialize returns: an expression with
+	some of its inputs fixed, still taking every other input
+	in the same order.
+
+	- freeVariables: the variables that are not fixed, in the
+		order of the varsSorted of the original expression.
+		get_output and get_outputs take their inputs in this
+		order.
+	- values: the fixed inputs, by name
+	- inputer: a DigitalInputer (see DigitalInputer.py) of the
+		folded expression, over the variables it still uses,
+		or None if the output no longer depends on any input
+	- constant: that output (0 or 1) when inputer is None
+
+	The folded expression only holds what the output depends
+	on; inputs it does not use anymore are just skipped.
+	"""
+
+	def __init__(self, free_variables, values, inputer=None, constant=None):
+		assert (inputer is None) != (constant is None), "Either an inputer or a constant must be given"
+		self.freeVariables = list(free_variables)
+		self.values = dict(values)
+		self.inputer = inputer
+		self.constant = constant
+		self.raw = inputer.raw if inputer is not None else str(constant)
+		positions = {name: position for position, name in enumerate(self.freeVariables)}
+		# position in freeVariables of every input of inputer
+		self.positions = [] if inputer is None else [positions[name] for name in inputer.expression.varsSorted]
+
+	def get_output(self, array, lazy=False):
+		"""
+		Given the inputs of the free variables, as an array in
+		the order of freeVariables or a dictionary by name,
+		returns the output (see DigitalInputer.get_output)
+		"""
+		if isinstance(array, dict):
+			for name in self.freeVariables:
+				assert name in array, "Missing input for variable: " + name
+			array = [array[name] for name in self.freeVariables]
+		assert len(array) == len(self.freeVariables), "The length of the array must equal the number of free variables"
+		if self.inputer is None:
+			for IN in array:
+				InputAsserter.assert_input(IN)
+			return self.constant
+		return self.inputer.get_output([array[position] for position in self.positions], lazy)
+
+	def get_outputs(self, inputs):
+		"""
+		Given a 2-D NumPy array with one input per row, its
+		columns in the order of freeVariables, returns the
+		output of every row (see DigitalInputer.get_outputs)
+		"""
+		if numpy is None:
+			raise ImportError("get_outputs requires numpy to be installed")
+		InputAsserter.assert_matrix_is_valid(inputs, len(self.freeVariables))
+		if self.inputer is None:
+			return numpy.full(len(inputs), self.constant, dtype=numpy.uint8)
+		return self.inputer.get_outputs(inputs[:, self.positions])
+
+	def __str__(self):
+		return self.raw
+
+	def __repr__(self):
+		return self.raw
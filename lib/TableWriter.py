@@ -0,0 +1,122 @@
+import itertools
+
+
+class TableWriter:
+	"""
+	Writes output tables to a file-like object (anything
+	with a write method taking strings, such as an open text
+	file, sys.stdout or io.StringIO) as their rows come, so
+	that a table never has to be held in memory as a whole.
+	Rows are formatted and written BUFFER_ROWS at a time.
+
+	Rows are (inputs, output) pairs such as ((0,1), 1), and
+	the variables are the headers of the inputs. FORMATS are:
+	- "text": the layout of DigitalInputer.print_output_table
+			A B | OUT
+			0 0 | 0
+		with a line break before every line, including the
+		header.
+	- "markdown": a Markdown table, as shown in the README
+	- "csv": a header line, then one line per row,
+		separated by commas
+	- "jsonl": one JSON object per row, mapping every
+		variable and "OUT" to its value
+	"""
+
+	FORMATS = ("text", "markdown", "csv", "jsonl")
+	BUFFER_ROWS = 4096
+	LOW_COUNT = 8
+	SEPARATORS = {"text": " ", "markdown": " | ", "csv": ",", "jsonl": ", "}
+
+	def __init__(self, file, varsSorted, format="text"):
+		assert format in TableWriter.FORMATS, "format must be one of " + ", ".join(TableWriter.FORMATS)
+		self.file = file
+		self.varsSorted = [str(var) for var in varsSorted]
+		self.format = format
+		self.__format_row = {
+			"text": self.__format_text_row,
+			"markdown": self.__format_markdown_row,
+			"csv": self.__format_csv_row,
+			"jsonl": self.__format_jsonl_row,
+		}[format]
+		self.__separator = TableWriter.SEPARATORS[format]
+		# the keys of every JSON object, already quoted
+		self.__keys = ['"' + var + '": ' for var in self.varsSorted]
+		self.__low_cells = {}
+		self.__high_inputs, self.__high_cells = None, None
+
+	def write_table(self, rows):
+		"""
+		Writes the header, then every row
+		"""
+		self.write_header()
+		self.write_rows(rows)
+
+	def write_header(self):
+		if self.format == "text":
+			self.file.write("\n" + " ".join(self.varsSorted) + " | OUT")
+		elif self.format == "markdown":
+			self.file.write("| " + " | ".join(self.varsSorted + ["OUT"]) + " |\n")
+			self.file.write("| " + " | ".join(["-" * len(var) for var in self.varsSorted] + ["---"]) + " |\n")
+		elif self.format == "csv":
+			self.file.write(",".join(self.varsSorted + ["OUT"]) + "\n")
+
+	def write_rows(self, rows):
+		"""
+		Writes the given rows, in bulk
+		"""
+		rows = iter(rows)
+		while True:
+			chunk = list(itertools.islice(rows, TableWriter.BUFFER_ROWS))
+			if len(chunk) == 0:
+				return
+			self.file.write("".join([self.__format_row(self.__get_cells(inputs), output) for inputs, output in chunk]))
+
+	def __get_cells(self, inputs):
+		"""
+		Returns the inputs of a row as they are written,
+		separated like the format needs. Consecutive rows
+		mostly differ in their last inputs, so the cells of
+		the last LOW_COUNT inputs are looked up in a table,
+		and the ones of the others are reused from the
+		previous row while they do not change.
+		"""
+		split = max(len(inputs) - TableWriter.LOW_COUNT, 0)
+		low = self.__low_cells.get(inputs[split:])
+		if low is None:
+			low = self.__join_cells(inputs[split:], split)
+			self.__low_cells[inputs[split:]] = low
+		if split == 0:
+			return low
+		if inputs[:split] != self.__high_inputs:
+			self.__high_inputs = inputs[:split]
+			self.__high_cells = self.__join_cells(self.__high_inputs, 0) + self.__separator
+		return self.__high_cells + low
+
+	def __join_cells(self, inputs, start):
+		if self.format == "markdown":
+			cells = [str(IN).center(len(var)) for IN, var in zip(inputs, self.varsSorted[start:])]
+		elif self.format == "jsonl":
+			cells = [key + str(IN) for key, IN in zip(self.__keys[start:], inputs)]
+		elif self.format == "text":
+			# inputs are lined up with their variable
+			cells = [str(IN).ljust(len(var)) for IN, var in zip(inputs, self.varsSorted[start:])]
+		else:
+			cells = map(str, inputs)
+		return self.__separator.join(cells)
+
+	@staticmethod
+	def __format_text_row(cells, output):
+		return "\n" + cells + " | " + str(output)
+
+	@staticmethod
+	def __format_markdown_row(cells, output):
+		return "| " + cells + " |  " + str(output) + "  |\n"
+
+	@staticmethod
+	def __format_csv_row(cells, output):
+		return cells + "," + str(output) + "\n"
+
+	@staticmethod
+	def __format_jsonl_row(cells, output):
+		return "{" + cells + ', "OUT": ' + str(output) + "}\n"
@@ -0,0 +1,312 @@
+import itertools
+import concurrent.futures
+
+
+class TruthTable:
+	"""
+	Holds the outputs of an expression for every possible
+	input as a packed bit vector: a bytearray where bit r
+	(bit r % 8 of byte r // 8) is the output of row r, and
+	row r is the input whose binary digits are r, the first
+	variable of varsSorted being the most significant one.
+	For instance, for the variables "A, B", row 2 is the
+	input [1, 0]. A table of 22 variables takes 512 KB.
+
+	The table is computed with bitslicing: each variable is
+	given an integer mask holding its value on every row of
+	a block, and the compiled expression (see
+	CompiledExpression.py) is evaluated once per block on
+	those masks instead of once per row. Blocks can be
+	computed by several processes at once.
+
+	Useful methods:
+	- table[index] or table[inputs]: the output on a row,
+		given by its index or by its inputs (e.g. (0,1))
+	- count(): the number of rows where the output is 1
+	- get_probability(biases): the probability of a 1 with
+		independent inputs
+	- iteration: yields the output of every row, in order
+	- &, |, ^ and ~: combine tables over the same variables
+	- to_dict(): a dictionary mapping tuples of inputs to
+		outputs, like DigitalInputer.get_table_output_dictionary
+	"""
+
+	# the masks of a block cover 2 ** BLOCK_BITS rows, so
+	# computing a big table only holds one block at a time
+	BLOCK_BITS = 16
+	# ranges of blocks given to every worker process
+	CHUNKS_PER_PROCESS = 4
+	# the bits of every byte, least significant first
+	BYTE_BITS = [tuple((byte >> shift) & 1 for shift in range(8)) for byte in range(256)]
+
+	def __init__(self, varsSorted, data):
+		"""
+		data is either the packed bytes described above
+		or an integer whose bit r is the output of row r
+		"""
+		self.varsSorted = varsSorted
+		self.varCount = len(varsSorted)
+		self.rowCount = 2 ** self.varCount
+		size = (self.rowCount + 7) // 8
+		if type(data) == int:
+			data = data.to_bytes(size, "little")
+		assert len(data) == size, "data must hold exactly one bit per row"
+		self.data = bytearray(data)
+
+	@staticmethod
+	def from_compiled(compiled, processes=None):
+		"""
+		Returns the TruthTable of a CompiledExpression.
+		With processes, the blocks are computed by that
+		many worker processes (see iter_compiled_chunks).
+		"""
+		data = bytearray((2 ** compiled.varCount + 7) // 8)
+		for offset, chunk in TruthTable.iter_compiled_chunks(compiled, processes):
+			data[offset:offset + len(chunk)] = chunk
+		return TruthTable(compiled.varsSorted, data)
+
+	@staticmethod
+	def iter_compiled_outputs(compiled, processes=None):
+		"""
+		Yields the output of every row of the TruthTable
+		of a CompiledExpression, in order, computing a few
+		blocks at a time instead of the whole table
+		"""
+		rows = 2 ** compiled.varCount
+		for _, chunk in TruthTable.iter_compiled_chunks(compiled, processes):
+			yield from TruthTable.iter_packed_outputs(chunk, min(8 * len(chunk), rows))
+
+	@staticmethod
+	def iter_compiled_chunks(compiled, processes=None):
+		"""
+		Yields (offset, chunk) pairs covering the packed
+		bytes of the TruthTable of a CompiledExpression, in
+		order, where chunk holds the bytes starting at offset.
+
+		Without processes, every block is computed here, one
+		at a time. Otherwise, the blocks are split into
+		contiguous ranges, CHUNKS_PER_PROCESS per process,
+		that a pool of that many processes computes; each
+		range is sent with the pickled CompiledExpression.
+		"""
+		compiled.assert_operations_are_valid()
+		count = compiled.varCount
+		block_count = TruthTable.get_block_count(count)
+		size = (2 ** min(count, TruthTable.BLOCK_BITS) + 7) // 8
+		if processes is None or processes <= 1 or block_count == 1:
+			for block in range(block_count):
+				yield block * size, TruthTable.get_blocks_data(compiled, block, block + 1)
+			return
+		chunk_count = min(block_count, processes * TruthTable.CHUNKS_PER_PROCESS)
+		starts = [block_count * index // chunk_count for index in range(chunk_count)]
+		stops = starts[1:] + [block_count]
+		with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+			# results come in the order of the ranges
+			chunks = executor.map(TruthTable.get_blocks_data, itertools.repeat(compiled), starts, stops)
+			for start, chunk in zip(starts, chunks):
+				yield start * size, chunk
+
+	@staticmethod
+	def iter_packed_outputs(data, row_count):
+		"""
+		Yields the first row_count outputs packed in data,
+		bit r % 8 of byte r // 8 being the output of row r
+		"""
+		byte_bits = TruthTable.BYTE_BITS
+		if row_count < 8:
+			yield from byte_bits[data[0]][:row_count]
+			return
+		for byte in data:
+			yield from byte_bits[byte]
+
+	@staticmethod
+	def get_block_count(var_count):
+		"""
+		Returns the number of blocks the rows of a table
+		of var_count variables are computed in
+		"""
+		return 2 ** max(var_count - TruthTable.BLOCK_BITS, 0)
+
+	@staticmethod
+	def get_block_bits(compiled, block):
+		"""
+		Returns the outputs of the rows of the given block,
+		as an integer whose bit r is the output of the r-th
+		row of the block. The variables that are constant
+		over a block (the first ones) get a mask of all 0s
+		or all 1s, depending on the index of the block.
+		"""
+		masks, full = TruthTable.get_block_masks(compiled.varCount, block)
+		return compiled.evaluate(masks, full)
+
+	@staticmethod
+	def get_block_masks(var_count, block):
+		"""
+		Returns the pair (masks, full) to evaluate the given
+		block on, where full is the mask of all 1s
+		"""
+		low_count = min(var_count, TruthTable.BLOCK_BITS)
+		high_count = var_count - low_count
+		full = (1 << (2 ** low_count)) - 1
+		masks = [full if (block >> (high_count - 1 - index)) & 1 else 0 for index in range(high_count)]
+		masks.extend([TruthTable.get_variable_mask(index, low_count) for index in range(low_count)])
+		return masks, full
+
+	@staticmethod
+	def get_blocks_data(compiled, start, stop):
+		"""
+		Returns the packed bytes of the blocks from start
+		to stop (excluded)
+		"""
+		size = (2 ** min(compiled.varCount, TruthTable.BLOCK_BITS) + 7) // 8
+		return b"".join([TruthTable.get_block_bits(compiled, block).to_bytes(size, "little") for block in range(start, stop)])
+
+	@staticmethod
+	def get_variable_mask(index, var_count):
+		"""
+		Returns the mask of the variable at the given index:
+		an integer whose bit r is the value of that variable
+		on row r. For instance, with 2 variables, the mask
+		of the first one is 0b1100 and the mask of the
+		second one is 0b1010.
+		"""
+		# the variable is constant over runs of period rows
+		period = 2 ** (var_count - 1 - index)
+		mask = ((1 << period) - 1) << period
+		width, total = 2 * period, 2 ** var_count
+		while width < total:
+			# double the pattern until it covers every row
+			mask |= mask << width
+			width *= 2
+		return mask
+
+	def get_row_index(self, array):
+		"""
+		Returns the index of the row of the given inputs
+		"""
+		assert len(array) == self.varCount, "The length of the array must equal the number of variables in the expression"
+		index = 0
+		for IN in array:
+			assert IN == 0 or IN == 1, "Inputs must be 0 or 1"
+			index = (index << 1) | IN
+		return index
+
+	def get_output_at(self, index):
+		"""
+		Returns the output on the row at the given index
+		"""
+		assert 0 <= index < self.rowCount, "Row index must be between 0 and " + str(self.rowCount - 1)
+		return (self.data[index >> 3] >> (index & 7)) & 1
+
+	def __getitem__(self, key):
+		"""
+		Returns the output on a row, given either its index
+		or its inputs as a tuple or a list
+		"""
+		if type(key) == int:
+			return self.get_output_at(key)
+		return self.get_output_at(self.get_row_index(key))
+
+	def count(self):
+		"""
+		Returns the number of rows where the output is 1,
+		counting the bytes one chunk at a time
+		"""
+		total, chunk = 0, 2 ** 20
+		for start in range(0, len(self.data), chunk):
+			total += int.from_bytes(self.data[start:start + chunk], "little").bit_count()
+		return total
+
+	def get_bits(self):
+		"""
+		Returns the table as an integer whose bit r is the
+		output of row r
+		"""
+		return int.from_bytes(self.data, "little")
+
+	def get_probability(self, biases):
+		"""
+		Returns the probability that the output is 1 when
+		every variable is 1 with its probability in biases
+		(in the order of varsSorted), independently of the
+		others
+		"""
+		assert len(biases) == self.varCount, "There must be one bias per variable"
+		if self.varCount < 3:
+			return TruthTable.__fold_probabilities([float(output) for output in self.iter_outputs()], biases)
+		# the last 3 variables vary within a byte, so the
+		# probability of every byte value is looked up
+		byte_probabilities = [TruthTable.__fold_probabilities([float(output) for output in TruthTable.BYTE_BITS[byte]], biases[-3:]) for byte in range(256)]
+		high = biases[:-3]
+		# bytes are merged on the other variables as they come,
+		# keeping one (level, probability) pair per level
+		pending = []
+		for byte in self.data:
+			probability, level = byte_probabilities[byte], 0
+			while len(pending) > 0 and pending[-1][0] == level:
+				bias = high[len(high) - 1 - level]
+				probability = (1 - bias) * pending.pop()[1] + bias * probability
+				level += 1
+			pending.append((level, probability))
+		return pending[0][1]
+
+	@staticmethod
+	def __fold_probabilities(probabilities, biases):
+		# the last variable alternates on every row, so pairs of
+		# rows are merged on it, then on the variable before
+		for bias in reversed(biases):
+			probabilities = [(1 - bias) * probabilities[row] + bias * probabilities[row + 1] for row in range(0, len(probabilities), 2)]
+		return probabilities[0]
+
+	def iter_outputs(self):
+		"""
+		Yields the output of every row, in order
+		"""
+		return TruthTable.iter_packed_outputs(self.data, self.rowCount)
+
+	def iter_rows(self):
+		"""
+		Yields (inputs, output) for every row, in order,
+		where inputs is a tuple such as (0,0,1)
+		"""
+		inputs = itertools.product((0, 1), repeat=self.varCount)
+		return zip(inputs, self.iter_outputs())
+
+	def to_dict(self):
+		"""
+		Returns a dictionary mapping tuples of inputs
+		(e.g.: (0,0,1)) to outputs. This holds a tuple per
+		row, so it is only meant for small tables.
+		"""
+		return dict(self.iter_rows())
+
+	def __iter__(self):
+		return self.iter_outputs()
+
+	def __len__(self):
+		return self.rowCount
+
+	def __combine(self, other, combine):
+		assert isinstance(other, self.__class__), "Tables can only be combined with tables"
+		assert self.varsSorted == other.varsSorted, "Tables can only be combined if they have the same variables"
+		return TruthTable(self.varsSorted, combine(self.get_bits(), other.get_bits()))
+
+	def __and__(self, other):
+		return self.__combine(other, lambda first, second: first & second)
+
+	def __or__(self, other):
+		return self.__combine(other, lambda first, second: first | second)
+
+	def __xor__(self, other):
+		return self.__combine(other, lambda first, second: first ^ second)
+
+	def __invert__(self):
+		return TruthTable(self.varsSorted, self.get_bits() ^ ((1 << self.rowCount) - 1))
+
+	def __eq__(self, other):
+		if isinstance(other, self.__class__):
+			return list(self.varsSorted) == list(other.varsSorted) and self.data == other.data
+		return False
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
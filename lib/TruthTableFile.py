@@ -0,0 +1,209 @@
+import mmap
+import struct
+
+from lib.TruthTable import TruthTable
+
+
+class TruthTableFile:
+	"""
+	Reads a truth table saved on disk by TruthTableWriter
+	without loading it: the file is memory-mapped, so only
+	the pages holding the rows looked up are read, and
+	processes opening the same file share those pages.
+
+	The file is made of a header followed by the outputs,
+	packed like TruthTable.data (bit r % 8 of byte r // 8
+	is the output of row r). The header is:
+	- MAGIC, the format VERSION, a reserved byte and the
+		number of variables (little-endian, see HEADER),
+	- the name of every variable of varsSorted, in order,
+		as its length in bytes (2 bytes) and its UTF-8 bytes,
+	- zeros up to a multiple of 8 bytes.
+	"""
+
+	MAGIC = b"DITT"
+	VERSION = 1
+	HEADER = struct.Struct("<4sBBH")
+	NAME_LENGTH = struct.Struct("<H")
+
+	def __init__(self, path):
+		self.path = path
+		self.__file = open(path, "rb")
+		self.__map = None
+		try:
+			self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+			self.__read_header()
+		except BaseException:
+			# the file is not kept open if it cannot be read
+			if self.__map is not None:
+				self.__map.close()
+			self.__file.close()
+			raise
+		# the packed outputs, still on disk
+		self.data = memoryview(self.__map)[self.offset:]
+
+	def __read_header(self):
+		magic, version, _, var_count = TruthTableFile.HEADER.unpack_from(self.__map, 0)
+		assert magic == TruthTableFile.MAGIC, "The file is not a truth table file"
+		assert version == TruthTableFile.VERSION, "Unsupported truth table file version: " + str(version)
+		position = TruthTableFile.HEADER.size
+		self.varsSorted = []
+		for _ in range(var_count):
+			length, = TruthTableFile.NAME_LENGTH.unpack_from(self.__map, position)
+			position += TruthTableFile.NAME_LENGTH.size
+			self.varsSorted.append(self.__map[position:position + length].decode("utf-8"))
+			position += length
+		self.varCount = var_count
+		self.rowCount = 2 ** var_count
+		self.offset = TruthTableFile.get_padded_size(position)
+		size = (self.rowCount + 7) // 8
+		assert len(self.__map) == self.offset + size, "The file does not hold one bit per row"
+
+	@staticmethod
+	def get_padded_size(size):
+		return (size + 7) // 8 * 8
+
+	@staticmethod
+	def get_header(varsSorted):
+		"""
+		Returns the header of a file holding the truth
+		table of the given variables
+		"""
+		header = bytearray(TruthTableFile.HEADER.pack(TruthTableFile.MAGIC, TruthTableFile.VERSION, 0, len(varsSorted)))
+		for name in varsSorted:
+			encoded = str(name).encode("utf-8")
+			header += TruthTableFile.NAME_LENGTH.pack(len(encoded)) + encoded
+		header += bytes(TruthTableFile.get_padded_size(len(header)) - len(header))
+		return bytes(header)
+
+	def get_output(self, array):
+		"""
+		Returns the output for the given input array, in the
+		order of varsSorted, like DigitalInputer.get_output
+		"""
+		assert len(array) == self.varCount, "The length of the array must equal the number of variables in the expression"
+		index = 0
+		for IN in array:
+			assert IN == 0 or IN == 1, "Inputs must be 0 or 1"
+			index = (index << 1) | IN
+		return self.get_output_at(index)
+
+	def get_output_at(self, index):
+		"""
+		Returns the output on the row at the given index
+		"""
+		assert 0 <= index < self.rowCount, "Row index must be between 0 and " + str(self.rowCount - 1)
+		return (self.data[index >> 3] >> (index & 7)) & 1
+
+	def __getitem__(self, key):
+		if type(key) == int:
+			return self.get_output_at(key)
+		return self.get_output(key)
+
+	def count(self):
+		"""
+		Returns the number of rows where the output is 1,
+		reading the file one chunk at a time
+		"""
+		total, chunk = 0, 2 ** 20
+		for start in range(0, len(self.data), chunk):
+			total += int.from_bytes(self.data[start:start + chunk], "little").bit_count()
+		return total
+
+	def iter_outputs(self):
+		"""
+		Yields the output of every row, in order
+		"""
+		return TruthTable.iter_packed_outputs(self.data, self.rowCount)
+
+	def to_truth_table(self):
+		"""
+		Returns the whole table, loaded in memory, as a
+		TruthTable
+		"""
+		return TruthTable(list(self.varsSorted), self.data)
+
+	def close(self):
+		self.data.release()
+		self.__map.close()
+		self.__file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def __len__(self):
+		return self.rowCount
+
+
+class TruthTableWriter:
+	"""
+	Writes a truth table file (see TruthTableFile) as its
+	rows come, so that tables bigger than the memory can be
+	saved. Outputs are given one row at a time with
+	write_output, or eight rows per byte at a time with
+	write_bytes, in the order of the rows. Every row must be
+	written before closing the writer.
+	"""
+
+	def __init__(self, path, varsSorted):
+		self.path = path
+		self.varsSorted = varsSorted
+		self.rowCount = 2 ** len(varsSorted)
+		self.rowsWritten = 0
+		# outputs of the rows not written yet, as the bits of a byte
+		self.__byte = 0
+		self.__file = open(path, "wb")
+		self.__file.write(TruthTableFile.get_header(varsSorted))
+
+	@staticmethod
+	def write_compiled(path, compiled, processes=None):
+		"""
+		Computes the truth table of a CompiledExpression
+		block by block, with that many processes if given
+		(see TruthTable.py), and writes the blocks as soon
+		as they are computed
+		"""
+		compiled.assert_operations_are_valid()
+		with TruthTableWriter(path, compiled.varsSorted) as writer:
+			for _, chunk in TruthTable.iter_compiled_chunks(compiled, processes):
+				writer.write_bytes(chunk)
+
+	def write_output(self, output):
+		"""
+		Writes the output of the next row
+		"""
+		assert output == 0 or output == 1, "Outputs must be 0 or 1"
+		assert self.rowsWritten < self.rowCount, "Every row was already written"
+		self.__byte |= output << (self.rowsWritten & 7)
+		self.rowsWritten += 1
+		if self.rowsWritten & 7 == 0 or self.rowsWritten == self.rowCount:
+			self.__file.write(bytes([self.__byte]))
+			self.__byte = 0
+
+	def write_bytes(self, data):
+		"""
+		Writes the outputs of the next 8 * len(data) rows,
+		packed like TruthTable.data. This can only be done
+		on a multiple of 8 rows.
+		"""
+		assert self.rowsWritten & 7 == 0, "Bytes can only be written after a multiple of 8 rows"
+		rows = min(8 * len(data), self.rowCount - self.rowsWritten)
+		assert rows == 8 * len(data) or (rows > 0 and len(data) == 1), "More rows were given than the table holds"
+		self.__file.write(data)
+		self.rowsWritten += rows
+
+	def close(self):
+		assert self.rowsWritten == self.rowCount, "Every row must be written before closing"
+		self.__file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exception_type, *args):
+		if exception_type is None:
+			self.close()
+		else:
+			self.__file.close()
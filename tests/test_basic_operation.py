@@ -0,0 +1,43 @@
+import unittest
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from lib.BasicOperation import AdvancedOperation, Operator
+from lib.DigitalInputer import DigitalInputer
+
+
+@unittest.skipIf(numpy is None, "needs numpy")
+class TestThreshold(unittest.TestCase):
+
+	def setUp(self):
+		AdvancedOperation.register(Operator.threshold(4, "@"))
+		AdvancedOperation.register(Operator.threshold(0, "%"))
+
+	def tearDown(self):
+		AdvancedOperation.unregister("@")
+		AdvancedOperation.unregister("%")
+		DigitalInputer.CACHE.clear()
+
+	def test_more_than_the_inputs(self):
+		inputs = numpy.array([[0, 0, 0], [1, 1, 1], [1, 0, 1]])
+		outputs = DigitalInputer("A@B@C").get_outputs(inputs)
+		self.assertEqual(outputs.shape, (3,))
+		self.assertEqual(outputs.tolist(), [0, 0, 0])
+
+	def test_no_inputs_needed(self):
+		inputs = numpy.array([[0, 0], [1, 0]])
+		outputs = DigitalInputer("A%B").get_outputs(inputs)
+		self.assertEqual(outputs.shape, (2,))
+		self.assertEqual(outputs.tolist(), [1, 1])
+
+	def test_at_most_the_inputs(self):
+		inputs = numpy.array([[0, 1, 1, 1], [1, 1, 1, 1], [1, 0, 1, 0]])
+		outputs = DigitalInputer("A@B@C@D").get_outputs(inputs)
+		self.assertEqual(outputs.tolist(), [0, 1, 0])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,35 @@
+import itertools
+import unittest
+
+from lib.BasicOperation import AdvancedOperation, Operator
+from lib.DigitalInputer import DigitalInputer
+
+
+class TestBinaryDecisionDiagram(unittest.TestCase):
+
+	def setUp(self):
+		# a unary gate, so only its kernel knows what it does
+		AdvancedOperation.register(Operator("~", "INVERT", lambda array: 1 - array[0], minimum=1, maximum=1))
+
+	def tearDown(self):
+		AdvancedOperation.unregister("~")
+		DigitalInputer.CACHE.clear()
+
+	def assert_matches_outputs(self, raw):
+		inputer = DigitalInputer(raw)
+		bdd = inputer.get_bdd()
+		for array in itertools.product((0, 1), repeat=inputer.expression.varCount):
+			self.assertEqual(bdd.get_output(list(array)), inputer.get_output(list(array)), raw + " on " + str(array))
+
+	def test_custom_unary_operator(self):
+		self.assert_matches_outputs("~A")
+		self.assert_matches_outputs("(~(A*B))+C")
+
+	def test_custom_unary_operator_is_applied(self):
+		inverted = DigitalInputer("~A").get_bdd()
+		self.assertEqual(inverted, DigitalInputer("!A").get_bdd(inverted.manager))
+		self.assertNotEqual(inverted, DigitalInputer("A+A").get_bdd(inverted.manager))
+
+
+if __name__ == "__main__":
+	unittest.main()
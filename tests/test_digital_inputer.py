@@ -0,0 +1,52 @@
+import time
+import itertools
+import unittest
+
+from lib.DigitalInputer import DigitalInputer
+
+
+class TestDigitalInputer(unittest.TestCase):
+
+	def tearDown(self):
+		DigitalInputer.CACHE.clear()
+
+	@staticmethod
+	def get_carry(bits):
+		# the carry out of a ripple-carry adder of a and b
+		carry = "(a0*b0)"
+		for index in range(1, bits):
+			a, b = "a" + str(index), "b" + str(index)
+			carry = "((" + a + "*" + b + ")+(" + carry + "*(" + a + "^" + b + ")))"
+		return carry[1:-1]
+
+	def test_count_true_inputs_of_wide_adder(self):
+		bits = 30
+		inputer = DigitalInputer(TestDigitalInputer.get_carry(bits))
+		start = time.perf_counter()
+		count = inputer.count_true_inputs()
+		probability = inputer.output_probability([0.5] * inputer.expression.varCount)
+		self.assertLess(time.perf_counter() - start, 1)
+		# a + b carries for a of the 2 ** bits values of b
+		self.assertEqual(count, 2 ** bits * (2 ** bits - 1) // 2)
+		self.assertEqual(probability, count / 2 ** (2 * bits))
+
+	def test_specialize_folds_the_expression(self):
+		inputer = DigitalInputer("(M*(A+B))+((!M)*(A^B^C))")
+		specialized = inputer.specialize({"M": 1})
+		self.assertEqual(specialized.freeVariables, ["A", "B", "C"])
+		self.assertEqual(specialized.raw, "A+B")
+		self.assertEqual(len(specialized.inputer.compiled.instructions), 1)
+		for array in itertools.product((0, 1), repeat=3):
+			self.assertEqual(specialized.get_output(list(array)), inputer.get_output(list(array) + [1]))
+
+	def test_specialize_every_input(self):
+		inputer = DigitalInputer("(A*B)+C")
+		specialized = inputer.specialize({"A": 1, "B": 0, "C": 1})
+		self.assertIsNone(specialized.inputer)
+		self.assertEqual(specialized.freeVariables, [])
+		self.assertEqual(specialized.get_output([]), 1)
+		self.assertEqual(inputer.specialize({"C": 0, "A": 0}).constant, 0)
+
+
+if __name__ == "__main__":
+	unittest.main()
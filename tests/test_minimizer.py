@@ -0,0 +1,64 @@
+import time
+import random
+import unittest
+
+from lib.TruthTable import TruthTable
+from lib.Minimizer import Minimizer
+
+
+class TestMinimizer(unittest.TestCase):
+
+	@staticmethod
+	def get_table(var_count, bits):
+		return TruthTable(["x" + str(index) for index in range(var_count)], bits)
+
+	def assert_covers(self, table, cover):
+		# the rows of every cube are set one by one, which is
+		# much faster than masks for the small cubes of big
+		# tables: row r has bit count - 1 - i of r as the input
+		# of variable i, like the bit of that variable in cubes
+		count = table.varCount
+		rows = bytearray(max(table.rowCount // 8, 1))
+		for mask, value in cover:
+			free = ((1 << count) - 1) & ~mask
+			subset = free
+			while True:
+				row = value | subset
+				rows[row >> 3] |= 1 << (row & 7)
+				if subset == 0:
+					break
+				subset = (subset - 1) & free
+		self.assertEqual(int.from_bytes(rows, "little"), table.get_bits())
+
+	def assert_minimizes_in_time(self, table):
+		start = time.perf_counter()
+		cover = Minimizer.get_cover(table)
+		elapsed = time.perf_counter() - start
+		self.assert_covers(table, cover)
+		self.assertLess(elapsed, 2 * Minimizer.TIME_LIMIT)
+
+	def test_random_18_variables(self):
+		table = TestMinimizer.get_table(18, random.Random(0).getrandbits(2 ** 18))
+		self.assert_minimizes_in_time(table)
+
+	def test_random_20_variables(self):
+		# the first split of the table is capped too
+		table = TestMinimizer.get_table(20, random.Random(0).getrandbits(2 ** 20))
+		self.assert_minimizes_in_time(table)
+
+	def test_parity_16_variables(self):
+		bits = 0
+		for row in range(2 ** 16):
+			bits |= (bin(row).count("1") % 2) << row
+		self.assert_minimizes_in_time(TestMinimizer.get_table(16, bits))
+
+	def test_exact_cover(self):
+		# (A*B)+(A*C)+(B*C), the majority of 3
+		table = TestMinimizer.get_table(3, 0b11101000)
+		cover = Minimizer.get_cover(table)
+		self.assert_covers(table, cover)
+		self.assertEqual(Minimizer.get_cost(cover), (6, 3))
+
+
+if __name__ == "__main__":
+	unittest.main()